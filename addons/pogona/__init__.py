@@ -38,25 +38,32 @@ if 'bpy' in locals():
     importlib.reload(props)
     importlib.reload(ops)
     importlib.reload(export)
+    importlib.reload(import_scene)
     importlib.reload(panel)
     importlib.reload(molecules_visualization)
+    importlib.reload(follow)
 else:
     from . import props
     from . import ops
     from . import export
+    from . import import_scene
     from . import panel
     from . import molecules_visualization
+    from . import follow
 
 import bpy
 from bpy.types import AddonPreferences
 from bpy.props import (
+    EnumProperty,
+    IntProperty,
     StringProperty,
 )
 from bpy.types import Menu
 
 
 class PogonaPreferences(AddonPreferences):
-    bl_idname = 'pogona.preferences'
+    # Must match the add-on's module name:
+    bl_idname = __name__
 
     objects_path: StringProperty(
         name="Objects path",
@@ -70,10 +77,73 @@ class PogonaPreferences(AddonPreferences):
         # update=my_update_func
     )
 
+    prefetch_depth: IntProperty(
+        name="Prefetch depth",
+        description=(
+            "Number of upcoming frames for which molecule positions "
+            "are decoded in the background during playback. "
+            "0 disables prefetching"
+        ),
+        default=4,
+        min=0,
+        soft_max=32,
+    )
+
+    prefetch_workers: IntProperty(
+        name="Prefetch threads",
+        description=(
+            "Number of background threads decoding molecule positions"
+        ),
+        default=2,
+        min=1,
+        soft_max=16,
+    )
+
+    frame_cache_budget: IntProperty(
+        name="Frame cache (MiB)",
+        description=(
+            "Memory budget for decoded molecule positions kept in memory "
+            "and shared by all visualizations. 0 disables the cache"
+        ),
+        default=1024,
+        min=0,
+        subtype='UNSIGNED',
+    )
+
+    max_molecules: IntProperty(
+        name="Maximum molecules per step",
+        description=(
+            "Show only about this many molecules of time steps with more "
+            "to avoid running out of memory. 0 for no limit"
+        ),
+        default=0,
+        min=0,
+    )
+
+    molecules_log_level: EnumProperty(
+        name="Log level",
+        description="What to record about molecule visualization updates",
+        items=(
+            ('OFF', "Off", "Neither print nor record anything"),
+            ('TIMING', "Timing",
+                "Record the time spent in each stage of an update "
+                "(shown in the molecules panel, exportable as a trace)"),
+            ('VERBOSE', "Verbose",
+                "Record timing and print every update to the console"),
+        ),
+        default='TIMING',
+    )
+
     def draw(self, context):
         layout = self.layout
         layout.label(text="Pogona Preferences")
         layout.prop(self, "objects_path")
+        layout.label(text="Molecules Visualization")
+        layout.prop(self, "prefetch_depth")
+        layout.prop(self, "prefetch_workers")
+        layout.prop(self, "frame_cache_budget")
+        layout.prop(self, "max_molecules")
+        layout.prop(self, "molecules_log_level")
 
 
 class VIEW3D_MT_mesh_pogona_add(Menu):
@@ -134,10 +204,17 @@ classes = (
     ops.PogonaAddSphere,
     ops.PogonaAddCylinder,
     ops.PogonaAddMoleculesVisualization,
+    ops.PogonaBuildMoleculesCache,
+    ops.PogonaBuildStringTable,
+    ops.PogonaExportMoleculesTimingTrace,
+    ops.PogonaComputeAttributeStatistics,
+    ops.PogonaBakeMolecules,
+    ops.PogonaExportSweep,
     PogonaPreferences,
     VIEW3D_MT_mesh_pogona_add,
     VIEW3D_MT_mesh_pogona_add_shapes,
     export.PogonaExporter,
+    import_scene.PogonaImporter,
     panel.PogonaPanel,
     panel.PogonaMoleculesVisualizationPanel,
     panel.POGONA_UL_ParticleAttrUIList,
@@ -158,8 +235,10 @@ def register():
     # Populate menu:
     bpy.types.VIEW3D_MT_add.append(menu_func)
     bpy.types.TOPBAR_MT_file_export.append(export.menu_func_export)
+    bpy.types.TOPBAR_MT_file_import.append(import_scene.menu_func_import)
 
     molecules_visualization.register_handlers()
+    follow.register_handlers()
 
     print("Pogona: ready")
 
@@ -170,7 +249,9 @@ def unregister():
 
     bpy.types.VIEW3D_MT_add.remove(menu_func)
     bpy.types.TOPBAR_MT_file_export.remove(export.menu_func_export)
+    bpy.types.TOPBAR_MT_file_import.remove(import_scene.menu_func_import)
 
     molecules_visualization.unregister_handlers()
+    follow.unregister_handlers()
 
     print("Unregistered Pogona")
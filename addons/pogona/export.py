@@ -56,6 +56,40 @@ def _check_object_scale(
     return ok
 
 
+def scene_components(
+        operator: bpy.types.Operator,
+        context: bpy.types.Context,
+) -> Dict[str, Dict]:
+    """The components of the scene as written to a scene.yaml file."""
+    components: Dict[str, Dict] = dict()
+    for obj in bpy.context.scene.objects:
+        if 'pogona_type' not in obj or 'pogona_shape' not in obj:
+            continue
+        print(f"Exporting object of type {obj['pogona_type']}")
+
+        unit_scale = context.scene.unit_settings.scale_length
+
+        components[obj.name] = dict(
+            # type=obj.pogona_type.pogona_value,
+            # ^ object type should now be written to the config.yaml,
+            # not scene.yaml
+            shape=obj.pogona_shape,
+            rotation=list(obj.rotation_euler),
+            translation=list(obj.location * unit_scale),
+            # ^ TODO: checkbox: apply unit scale
+            # Component scale is defined as LENGTH, apply unit scale:
+            scale=list(obj.pogona_component_scale * unit_scale),
+            # Additional visualization scale not defined as LENGTH,
+            # therefore no unit scale:
+            visualization_scale=list(
+                obj.pogona_representation.additional_scale
+            ),
+        )
+
+        _check_object_scale(operator=operator, obj=obj, context=context)
+    return components
+
+
 class PogonaExporter(bpy.types.Operator, ExportHelper):
     """Export scene for the Pogona simulator."""
 
@@ -72,35 +106,8 @@ class PogonaExporter(bpy.types.Operator, ExportHelper):
     )
 
     def execute(self, context):
-        components: Dict[str, Dict] = dict()
-        for obj in bpy.context.scene.objects:
-            if 'pogona_type' not in obj or 'pogona_shape' not in obj:
-                continue
-            print(f"Exporting object of type {obj['pogona_type']}")
-
-            unit_scale = context.scene.unit_settings.scale_length
-
-            components[obj.name] = dict(
-                # type=obj.pogona_type.pogona_value,
-                # ^ object type should now be written to the config.yaml,
-                # not scene.yaml
-                shape=obj.pogona_shape,
-                rotation=list(obj.rotation_euler),
-                translation=list(obj.location * unit_scale),
-                # ^ TODO: checkbox: apply unit scale
-                # Component scale is defined as LENGTH, apply unit scale:
-                scale=list(obj.pogona_component_scale * unit_scale),
-                # Additional visualization scale not defined as LENGTH,
-                # therefore no unit scale:
-                visualization_scale=list(
-                    obj.pogona_representation.additional_scale
-                ),
-            )
-
-            _check_object_scale(operator=self, obj=obj, context=context)
-
         data = dict(
-            components=components,
+            components=scene_components(self, context),
         )
 
         with open(self.filepath, 'w') as f:
@@ -114,3 +121,7 @@ def menu_func_export(self, context):
         PogonaExporter.bl_idname,
         text=PogonaExporter.bl_label
     )
+    self.layout.operator(
+        'pogona.export_sweep',
+        text="Pogona Scene Sweep",
+    )
@@ -0,0 +1,193 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Live-follow mode: show the latest time step of a simulation that is
+still running.
+
+A timer polls the positions directory of every following
+visualization object, decodes new time steps on a background thread,
+and only then shows them and advances the object's time step.
+"""
+
+import bpy
+from bpy.app.handlers import persistent
+import concurrent.futures
+from typing import Dict, Optional, Tuple
+from . import molecules_visualization
+from . import util
+from .trajectory import container
+from .trajectory import positions
+from .trajectory import steps
+from .trajectory import watch
+
+# Seconds between two polls of the followed directories:
+POLL_INTERVAL = 0.5
+
+# Watchers of the followed objects by object name:
+_watchers: Dict[str, watch.DirectoryWatcher] = dict()
+# The time step being decoded for each object, and its job:
+_jobs: Dict[str, Tuple[int, concurrent.futures.Future]] = dict()
+_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+
+def _get_pool() -> concurrent.futures.ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=2,
+            thread_name_prefix='pogona-follow',
+        )
+    return _pool
+
+
+def start(obj: bpy.types.Object):
+    """Start following the positions directory of `obj`."""
+    stop(obj.name)
+    path = util.molecule_positions_directory(obj)
+    if container.find_container(path) is not None:
+        raise Warning(
+            f"Object '{obj.name}' shows a trajectory container, which "
+            "cannot be followed. Select the directory of positions files "
+            "the simulation writes."
+        )
+    try:
+        _watchers[obj.name] = watch.DirectoryWatcher(path)
+    except OSError as e:
+        raise Warning(
+            "Could not find the molecule positions path of "
+            f"object '{obj.name}': {e}"
+        )
+    if not bpy.app.timers.is_registered(_follow):
+        bpy.app.timers.register(_follow, first_interval=POLL_INTERVAL)
+
+
+def stop(name: str):
+    """Stop following for the object named `name`."""
+    watcher = _watchers.pop(name, None)
+    if watcher is not None:
+        watcher.close()
+        steps.save_index(watcher.directory)
+    job = _jobs.pop(name, None)
+    if job is not None:
+        job[1].cancel()
+
+
+def _is_animated(obj) -> bool:
+    return molecules_visualization._step_at_frame(
+        obj, bpy.context.scene.frame_current) is not None
+
+
+def _advance(obj, step: int, frame: positions.MoleculeFrame):
+    index = steps.step_index(util.molecule_positions_directory(obj))
+    util.set_step_range(obj, index.min, index.max)
+    # The decoded frames cache may be disabled or have evicted the step,
+    # so do not leave loading it to the frame change handler:
+    molecules_visualization.show_decoded_step(
+        obj, bpy.context.scene, step, frame)
+
+
+def _follow_object(obj, watcher: watch.DirectoryWatcher):
+    job = _jobs.get(obj.name)
+    if job is not None:
+        step, future = job
+        if not future.done():
+            return
+        del _jobs[obj.name]
+        try:
+            frame = future.result()
+        except (OSError, ValueError) as e:
+            print(f"Could not decode time step {step} of object "
+                  f"'{obj.name}': {e}")
+        else:
+            try:
+                _advance(obj, step, frame)
+            except Warning as e:
+                print(e)
+
+    new_steps = watcher.poll()
+    # Keeps `step_index` from listing the directory for every new file:
+    steps.update_index(
+        watcher.directory, watcher.steps, watcher.directory_mtime_ns)
+    if (
+            not new_steps
+            or new_steps[-1] <= obj.pogona_molecule_positions_step
+            or _is_animated(obj)
+    ):
+        return
+    # Skip intermediate steps if the simulation is faster than decoding:
+    step = new_steps[-1]
+    decode = molecules_visualization.step_decoder(
+        obj, bpy.context.scene, step)
+    _jobs[obj.name] = (step, _get_pool().submit(decode))
+
+
+def _follow() -> Optional[float]:
+    for name, watcher in list(_watchers.items()):
+        obj = bpy.data.objects.get(name)
+        if obj is None or not obj.get('pogona_molecule_follow', False):
+            stop(name)
+            continue
+        if watcher.directory != util.molecule_positions_directory(obj):
+            # The positions path changed:
+            try:
+                start(obj)
+            except Warning as e:
+                print(e)
+                obj['pogona_molecule_follow'] = False
+            continue
+        try:
+            _follow_object(obj, watcher)
+        except OSError as e:
+            print(f"Stopped following object '{name}': {e}")
+            obj['pogona_molecule_follow'] = False
+            stop(name)
+    if not _watchers:
+        # Unregisters the timer:
+        return None
+    return POLL_INTERVAL
+
+
+@persistent
+def _resume_following(*args):
+    for name in list(_watchers):
+        stop(name)
+    for obj in bpy.data.objects:
+        if obj.get('pogona_molecule_follow', False):
+            try:
+                start(obj)
+            except Warning as e:
+                print(e)
+
+
+def register_handlers():
+    bpy.app.handlers.load_post.append(_resume_following)
+
+
+def unregister_handlers():
+    global _pool
+    bpy.app.handlers.load_post.remove(_resume_following)
+    for name in list(_watchers):
+        stop(name)
+    if bpy.app.timers.is_registered(_follow):
+        bpy.app.timers.unregister(_follow)
+    if _pool is not None:
+        _pool.shutdown(wait=False)
+        _pool = None
@@ -0,0 +1,73 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Import a Pogona scene YAML file into a new .blend file without the
+Blender user interface:
+
+    blender --background --python addons/pogona/import_headless.py -- \\
+        scene.yaml --output scene.blend [--base base.blend]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import bpy
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog='import_headless.py',
+        description=__doc__.strip().split('\n\n')[0],
+    )
+    parser.add_argument('scene')
+    parser.add_argument('--output', '-o', required=True)
+    parser.add_argument(
+        '--base',
+        help="A .blend file to import into, e.g., with a configured unit "
+             "scale (default: an empty scene)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.base is not None:
+        bpy.ops.wm.open_mainfile(filepath=args.base)
+    else:
+        bpy.ops.wm.read_homefile(use_empty=True)
+
+    # The add-on, if it is not enabled, is loaded from next to this
+    # script:
+    sys.path.insert(0, os.path.dirname(
+        os.path.dirname(os.path.abspath(__file__))))
+    from pogona import util
+    util.register_addon()
+    from pogona import import_scene
+
+    start = time.perf_counter()
+    objects = import_scene.import_scene(bpy.context, args.scene)
+    print(
+        f"Imported {len(objects)} components "
+        f"in {time.perf_counter() - start:.1f} s."
+    )
+    bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(args.output))
+
+
+main(sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else [])
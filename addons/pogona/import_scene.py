@@ -0,0 +1,125 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+from bpy_extras.io_utils import ImportHelper
+import bpy
+import mathutils
+import time
+import yaml
+from typing import List
+from . import ops
+from . import props
+
+# The C implementation is much faster for large scenes:
+_YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+_shape_indices = {
+    item[0]: i for i, item in enumerate(props._shape_items_default)
+}
+_type_indices = {
+    item[0]: i for i, item in enumerate(props._type_items_default)
+}
+
+
+def import_scene(
+        context: bpy.types.Context,
+        filepath: str,
+) -> List[bpy.types.Object]:
+    """
+    Create an object for every component of a Pogona scene YAML file
+    (as written by `PogonaExporter`) in the active collection.
+
+    Properties are written directly instead of through their update
+    callbacks, and objects of the same shape share their mesh.
+    """
+    with open(filepath, 'r') as f:
+        data = yaml.load(f, Loader=_YamlLoader)
+    components = (data or dict()).get('components') or dict()
+
+    unit_scale = context.scene.unit_settings.scale_length
+    collection = context.collection
+    objects = []
+    for name, component in components.items():
+        shape = component.get('shape', 'NONE')
+        if shape not in _shape_indices:
+            raise ValueError(
+                f"Component '{name}' has an unknown shape '{shape}'.")
+        obj = bpy.data.objects.new(name, ops.shape_mesh(context, shape))
+        collection.objects.link(obj)
+
+        # The inverse of PogonaExporter.execute:
+        scale = mathutils.Vector(component.get('scale', (1, 1, 1)))
+        visualization_scale = mathutils.Vector(
+            component.get('visualization_scale', (1, 1, 1)))
+        obj.location = (
+            mathutils.Vector(component.get('translation', (0, 0, 0)))
+            / unit_scale
+        )
+        obj.rotation_euler = component.get('rotation', (0, 0, 0))
+        obj.scale = scale * visualization_scale
+
+        # Assigning ID properties skips the update callbacks,
+        # which would rebuild the mesh and the scale of every object:
+        obj['pogona_flag'] = True
+        obj['pogona_shape'] = _shape_indices[shape]
+        obj['pogona_component_scale'] = list(scale / unit_scale)
+        obj.pogona_representation['additional_scale'] = list(
+            visualization_scale)
+        obj.pogona_type['pogona_type_enum'] = _type_indices['CUSTOM']
+        objects.append(obj)
+    return objects
+
+
+class PogonaImporter(bpy.types.Operator, ImportHelper):
+    """Import a scene for the Pogona simulator."""
+
+    bl_idname = 'pogona.importer'
+    bl_label = "Pogona Scene (.scene.yaml)"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    # Used by ImportHelper:
+    filename_ext = '.yaml'
+
+    filter_glob: bpy.props.StringProperty(
+        default='*.yaml',
+        options={'HIDDEN'},
+        maxlen=255,
+    )
+
+    def execute(self, context):
+        start = time.perf_counter()
+        try:
+            objects = import_scene(context, self.filepath)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            self.report({'ERROR'}, f"Could not import the scene: {e}")
+            return {'CANCELLED'}
+        self.report(
+            {'INFO'},
+            f"Imported {len(objects)} components "
+            f"in {time.perf_counter() - start:.1f} s."
+        )
+        return {'FINISHED'}
+
+
+def menu_func_import(self, context):
+    self.layout.operator(
+        PogonaImporter.bl_idname,
+        text=PogonaImporter.bl_label
+    )
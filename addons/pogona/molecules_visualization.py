@@ -18,16 +18,842 @@
 # along with Pogona.  If not, see <https://www.gnu.org/licenses/>.import bpy
 
 import bpy
-import mathutils
 from bpy.app.handlers import persistent
+import concurrent.futures
+import functools
+import math
+import numpy as np
 import os
-import csv
+from typing import (
+    Callable, Dict, List, NamedTuple, Optional, Set, Tuple)
 from . import util
+from .trajectory import cache
+from .trajectory import container
+from .trajectory import dictionary
+from .trajectory import filters
+from .trajectory import interpolate
+from .trajectory import lru
+from .trajectory import positions
+from .trajectory import prefetch
+from .trajectory import schema
+from .trajectory import statistics
+from .trajectory import steps
+from .trajectory import subsample
+from .trajectory import timing
+
+_frame_cache: Optional[lru.FrameCache] = None
+_prefetcher: Optional[prefetch.Prefetcher] = None
+_previous_frame: Optional[int] = None
+
+# Names of all objects with the 'pogona_molecule_visualization_flag',
+# so the frame change handler does not have to check every object:
+_visualization_names: Set[str] = set()
+# Number of objects in bpy.data when the registry was last rebuilt.
+# Objects may be added (e.g., duplicated) or removed without us noticing
+# otherwise.
+_registry_object_count: Optional[int] = None
+# Whether a render job is running, in which case all molecules are shown:
+_rendering = False
+# Objects whose molecules could not be shown correctly while rendering:
+render_errors: List[str] = []
+
+# Updates loading in the background by object name (asynchronous mode):
+_pending_updates: Dict[str, '_PendingUpdate'] = dict()
+_update_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+# Seconds between checks for finished updates:
+_APPLY_INTERVAL = 0.02
+
+
+def _attribute_data_type(attr_type):
+    return attr_type if attr_type != 'STRING_HASH' else 'INT'
+
+
+def _set_attributes(mesh, frame, attr_type_by_name, strings):
+    # Data for Geometry Nodes attributes:
+    with timing.span('attribute upload'):
+        for attr_name, attr_type in attr_type_by_name.items():
+            mesh.attributes[attr_name].data.foreach_set(
+                'vector' if attr_type == 'FLOAT_VECTOR' else 'value',
+                frame.attribute(attr_name, attr_type, strings.get(attr_name)),
+            )
+
+
+def _replace_mesh(obj, frame, scale, attr_type_by_name, strings):
+    """Build a new mesh for `obj` and delete the old one."""
+    with timing.span('mesh build'):
+        mesh = bpy.data.meshes.new(obj.name)
+        mesh.vertices.add(frame.count)
+        mesh.vertices.foreach_set('co', frame.positions(scale))
+        old_mesh = obj.data
+        # Transfer the first material to the new mesh:
+        if len(old_mesh.materials) > 0:
+            tmp_material = old_mesh.materials[0]
+            mesh.materials.append(tmp_material)
+
+        mesh.update()
+        obj.data = mesh
+    with timing.span('old mesh deletion'):
+        util.delete_mesh(old_mesh)
+
+    for attr_name, attr_type in attr_type_by_name.items():
+        mesh.attributes.new(
+            name=attr_name,
+            type=_attribute_data_type(attr_type),
+            domain='POINT'
+        )
+    mesh['_pogona_molecule_attributes'] = list(attr_type_by_name)
+    _set_attributes(mesh, frame, attr_type_by_name, strings)
+
+
+def _update_mesh_in_place(mesh, frame, scale, attr_type_by_name, strings):
+    """
+    Overwrite the vertices and attributes of an existing mesh.
+
+    The vertex array is only reallocated if the number of molecules
+    changed. Attribute layers are kept as long as their name and type
+    stay the same.
+    """
+    with timing.span('mesh build'):
+        if (
+                len(mesh.vertices) != frame.count
+                or len(mesh.edges) > 0
+                or len(mesh.polygons) > 0
+        ):
+            # Vertices can only be added, not removed.
+            # This also removes all attribute layers.
+            mesh.clear_geometry()
+            mesh.vertices.add(frame.count)
+        mesh.vertices.foreach_set('co', frame.positions(scale))
+
+    for attr_name, attr_type in attr_type_by_name.items():
+        attribute = mesh.attributes.get(attr_name)
+        data_type = _attribute_data_type(attr_type)
+        if attribute is not None and (
+                attribute.data_type != data_type
+                or attribute.domain != 'POINT'
+        ):
+            mesh.attributes.remove(attribute)
+            attribute = None
+        if attribute is None:
+            mesh.attributes.new(
+                name=attr_name,
+                type=data_type,
+                domain='POINT'
+            )
+    # Remove attributes that are no longer configured:
+    for attr_name in mesh.get('_pogona_molecule_attributes', []):
+        if attr_name not in attr_type_by_name and attr_name in mesh.attributes:
+            mesh.attributes.remove(mesh.attributes[attr_name])
+    mesh['_pogona_molecule_attributes'] = list(attr_type_by_name)
+
+    _set_attributes(mesh, frame, attr_type_by_name, strings)
+    mesh.update()
+
+
+def register_visualization(obj: bpy.types.Object):
+    """Add a newly created visualization object to the registry."""
+    global _registry_object_count
+    _visualization_names.add(obj.name)
+    if _registry_object_count is not None:
+        _registry_object_count = len(bpy.data.objects)
+
+
+def _rebuild_registry():
+    global _registry_object_count
+    _visualization_names.clear()
+    _visualization_names.update(
+        obj.name for obj in bpy.data.objects
+        if obj.get('pogona_molecule_visualization_flag', False)
+    )
+    _registry_object_count = len(bpy.data.objects)
+
+
+def _visualizations(scene) -> List[bpy.types.Object]:
+    """The visualization objects in `scene`."""
+    if _registry_object_count != len(bpy.data.objects):
+        _rebuild_registry()
+    objects = [bpy.data.objects.get(name) for name in _visualization_names]
+    if any(
+            obj is None
+            or not obj.get('pogona_molecule_visualization_flag', False)
+            for obj in objects
+    ):
+        # An object was renamed or is no longer a visualization:
+        _rebuild_registry()
+        objects = [bpy.data.objects[name] for name in _visualization_names]
+    return [obj for obj in objects if scene.objects.get(obj.name) == obj]
+
+
+@persistent
+def _rebuild_registry_handler(*args):
+    # Object names in the registry are meaningless after loading a file
+    # and may be outdated after undo or redo:
+    _rebuild_registry()
+
+
+def _get_prefetcher(context) -> Optional[prefetch.Prefetcher]:
+    global _prefetcher
+    depth = util.preference(context, 'prefetch_depth', 4)
+    workers = util.preference(context, 'prefetch_workers', 2)
+    if _prefetcher is not None and (
+            depth == 0 or _prefetcher.workers != workers):
+        _prefetcher.shutdown()
+        _prefetcher = None
+    if _prefetcher is None and depth > 0:
+        _prefetcher = prefetch.Prefetcher(workers=workers, capacity=depth)
+    return _prefetcher
+
+
+def _get_frame_cache(context) -> Optional[lru.FrameCache]:
+    global _frame_cache
+    budget = util.preference(context, 'frame_cache_budget', 1024) * 2 ** 20
+    if budget == 0:
+        if _frame_cache is not None:
+            _frame_cache.clear()
+        _frame_cache = None
+    elif _frame_cache is None:
+        _frame_cache = lru.FrameCache(max_bytes=budget)
+    elif _frame_cache.max_bytes != budget:
+        _frame_cache.resize(budget)
+    return _frame_cache
+
+
+def frame_cache_statistics():
+    """
+    Return hit rate, resident bytes, and evictions of the decoded frames
+    cache shared by all visualizations, if enabled.
+    """
+    if _frame_cache is None:
+        return None
+    return (
+        _frame_cache.hit_rate,
+        _frame_cache.resident_bytes,
+        _frame_cache.evictions,
+    )
+
+
+def timing_summary():
+    """
+    Number of events, mean and maximum duration in seconds for each
+    recorded stage of recent molecule updates, if timing is enabled.
+    """
+    if not timing.recorder.enabled:
+        return None
+    return timing.recorder.summary()
+
+
+def prefetch_statistics():
+    """Return hits, misses, and hit rate of the prefetcher, if enabled."""
+    if _prefetcher is None:
+        return None
+    return _prefetcher.hits, _prefetcher.misses, _prefetcher.hit_rate
+
+
+def _step_at_frame(obj, frame, scene=None):
+    """
+    The time step of `obj` at `frame` according to its time mapping, or
+    the key-framed time step if it is animated.
+    Fractional if `obj` interpolates between time steps.
+    """
+    mapping = util.time_mapping(obj, scene or bpy.context.scene)
+    if mapping is not None:
+        if obj.pogona_molecule_interpolate:
+            return mapping.fractional_step_at(frame)
+        return mapping.step_at(frame)
+    if obj.animation_data is None or obj.animation_data.action is None:
+        return None
+    fcurve = obj.animation_data.action.fcurves.find(
+        'pogona_molecule_positions_step'
+    )
+    if fcurve is None:
+        return None
+    if obj.pogona_molecule_interpolate:
+        return fcurve.evaluate(frame)
+    # F-curves of integer properties are rounded like this:
+    return math.floor(fcurve.evaluate(frame) + .5)
+
+
+def _resolve_steps(obj, requested_step, path=None) -> Tuple[
+        Optional[int], Optional[int], float]:
+    """
+    The available time step(s) to show for `requested_step` of `obj`.
+    Looked up in `path` instead of `obj`'s positions path if given.
+
+    :return: A time step according to the step lookup setting of `obj`.
+        When interpolating, the available time steps before and after
+        `requested_step` and the interpolation weight of the latter.
+        The second time step is None if there is nothing to interpolate.
+    """
+    index = steps.step_index(path or util.molecule_positions_directory(obj))
+    if not obj.pogona_molecule_interpolate:
+        step = index.resolve(
+            int(requested_step), obj.pogona_molecule_step_lookup)
+        return step, None, 0.0
+    previous_step = index.resolve(
+        math.floor(requested_step), steps.LOOKUP_PREVIOUS)
+    next_step = index.resolve(math.ceil(requested_step), steps.LOOKUP_NEXT)
+    if (
+            previous_step is None
+            or next_step is None
+            or previous_step == next_step
+    ):
+        step = previous_step if previous_step is not None else next_step
+        return step, None, 0.0
+    t = (requested_step - previous_step) / (next_step - previous_step)
+    return previous_step, next_step, t
+
+
+def missing_columns(obj, columns=None) -> List[str]:
+    """
+    The columns of `columns` (by default those of `obj`'s attributes)
+    that the positions files of `obj` do not have, according to the
+    cached column layout of its run.
+    """
+    if columns is None:
+        columns = positions.columns_for_attributes(
+            util.molecule_attribute_types(obj))
+    path = util.molecule_positions_directory(obj)
+    if container.find_container(path) is not None:
+        # Containers validate the columns of every time step on loading.
+        return []
+    index = steps.step_index(path)
+    if len(index) == 0:
+        return []
+    run_schema = schema.directory_schema(
+        path, positions.positions_filename(path, index.min))
+    return run_schema.missing(columns)
+
+
+def update_missing_columns(obj) -> List[str]:
+    """
+    Store the columns `obj` needs that its positions files do not have
+    (see `missing_columns`) in its `_pogona_missing_columns` custom
+    property, for drawing the panel without reading any files.
+    """
+    try:
+        missing = missing_columns(obj, used_columns(obj))
+    except (OSError, ValueError):
+        missing = []
+    if list(obj.get('_pogona_missing_columns', [])) != missing:
+        obj['_pogona_missing_columns'] = missing
+    return missing
+
+
+def _level_of_detail(obj) -> Optional[Tuple[float, int]]:
+    """
+    The fraction and maximum number of molecules of `obj` to show,
+    or None to show all of them.
+    """
+    if _rendering:
+        return None
+    fraction = obj.pogona_molecule_viewport_fraction
+    max_points = obj.pogona_molecule_viewport_max_points
+    if fraction >= 1 and max_points == 0:
+        return None
+    return fraction, max_points
+
+
+def _frame_loader(
+        obj, step,
+        lod: Optional[Tuple[float, int]] = None,
+        molecule_filter: Optional[filters.MoleculeFilter] = None,
+):
+    """
+    :param lod: Subsample the molecules as returned by
+        `_level_of_detail()`.
+    :param molecule_filter: Only load the molecules this filter keeps.
+    :return: A key identifying the current version of time step `step`
+        of `obj`'s molecule positions, and a function decoding the given
+        columns of it.
+    """
+    path = util.molecule_positions_directory(obj)
+    max_molecules = util.preference(bpy.context, 'max_molecules', 0)
+    container_path = container.find_container(path)
+    if container_path is not None:
+        stat = os.stat(container_path)
+        key = (container_path, stat.st_size, stat.st_mtime_ns, step)
+        load_frame = functools.partial(
+            container.load_step, container_path, step)
+        if max_molecules > 0:
+            # Container columns are memory-mapped, no need to stream:
+            load_frame = functools.partial(
+                subsample.load_subsampled, load_frame, 1.0, max_molecules)
+        box_aware = max_molecules == 0
+    else:
+        filename = positions.positions_filename(path, step)
+        stat = os.stat(filename)
+        key = (filename, stat.st_size, stat.st_mtime_ns)
+        if obj.pogona_molecule_use_cache:
+            # Cache entries hold all molecules, subsample them below:
+            load_frame = functools.partial(
+                cache.load_positions, filename, max_molecules=max_molecules)
+        else:
+            # Only keep the molecules of the level of detail while
+            # parsing, instead of subsampling the decoded file:
+            fraction = 1.0
+            parse_max_molecules = max_molecules
+            if lod is not None:
+                key += lod
+                fraction, max_points = lod
+                lod = None
+                if max_points > 0 and molecule_filter is None:
+                    parse_max_molecules = min(
+                        max_points, max_molecules or max_points)
+                elif max_points > 0:
+                    # Of the molecules the filter keeps:
+                    lod = (1.0, max_points)
+            load_frame = functools.partial(
+                positions.load_positions, filename,
+                max_molecules=parse_max_molecules, fraction=fraction)
+        box_aware = obj.pogona_molecule_use_cache
+    if max_molecules > 0:
+        key += (max_molecules,)
+    if molecule_filter is not None:
+        key += (molecule_filter,)
+        load_frame = functools.partial(
+            filters.load_filtered, load_frame, molecule_filter,
+            box_aware=box_aware)
+    if lod is not None:
+        key += lod
+        load_frame = functools.partial(
+            subsample.load_subsampled, load_frame, *lod)
+    return key, load_frame
+
+
+def _columns(obj, attr_type_by_name, lod) -> Dict[str, str]:
+    """The columns to load for `obj`'s attributes."""
+    columns = positions.columns_for_attributes(attr_type_by_name)
+    if obj.pogona_molecule_interpolate or lod is not None:
+        columns[interpolate.ID_COLUMN] = positions.KIND_INT
+    return columns
+
+
+def step_decoder(
+        obj, scene, step) -> Callable[[], positions.MoleculeFrame]:
+    """
+    A function decoding and returning time step `step` of `obj` the way
+    the frame change handler would load it, storing it in the decoded
+    frames cache (and the binary cache, if `obj` uses it) if enabled.
+    Unlike this function, the returned function may be called from any
+    thread. Pass its result to `show_decoded_step`.
+    """
+    lod = _level_of_detail(obj)
+    columns = _columns(obj, util.molecule_attribute_types(obj), lod)
+    molecule_filter = util.molecule_filter(obj, scene)
+    key, load_frame = _frame_loader(obj, step, lod, molecule_filter)
+    load_frame = _with_frame_cache(
+        _get_frame_cache(bpy.context), key, load_frame)
+    return functools.partial(load_frame, columns)
+
+
+def _with_frame_cache(frame_cache, key, load_frame):
+    if frame_cache is None:
+        return load_frame
+    return functools.partial(frame_cache.load, key, load_frame=load_frame)
+
+
+def _load_frame(prefetcher, frame_cache, key, load_frame, columns):
+    load_frame = _with_frame_cache(frame_cache, key, load_frame)
+    if prefetcher is None:
+        return load_frame(columns)
+    return prefetcher.get((key, tuple(columns.items())), load_frame, columns)
+
+
+def _prefetch_upcoming_steps(
+        prefetcher, frame_cache, obj, scene, direction, columns, lod,
+        molecule_filter):
+    """Schedule decoding the time steps of the next frames of `obj`."""
+    depth = util.preference(bpy.context, 'prefetch_depth', 4)
+    scheduled = set()
+    for i in range(1, depth + 1):
+        frame = scene.frame_current + i * direction * scene.frame_step
+        requested_step = _step_at_frame(obj, frame, scene)
+        if requested_step is None:
+            continue
+        try:
+            for step in _resolve_steps(obj, requested_step)[:2]:
+                if step is None or step in scheduled:
+                    continue
+                scheduled.add(step)
+                key, load_frame = _frame_loader(
+                    obj, step, lod, molecule_filter)
+                prefetcher.prefetch(
+                    (key, tuple(columns.items())),
+                    _with_frame_cache(frame_cache, key, load_frame),
+                    columns
+                )
+        except OSError:
+            # Not (yet) available, nothing to prefetch.
+            continue
+
+
+def _frame_loaders(obj, step, next_step, lod, molecule_filter):
+    """
+    Keys and functions loading time step `step` of `obj` and, unless it
+    is None, `next_step`.
+    """
+    loaders = []
+    for load_step in (step, next_step):
+        if load_step is None:
+            continue
+        try:
+            loaders.append((load_step, *_frame_loader(
+                obj, load_step, lod, molecule_filter)))
+        except OSError as e:
+            raise _load_warning(obj.name, load_step, e)
+    return loaders
+
+
+def _load_warning(name, step, e) -> Warning:
+    return Warning(
+        f"Could not load time step {step} of object '{name}'. "
+        "Skipping molecule positions update. "
+        f"Exception: {e}"
+    )
+
+
+def _load_shown_frame(
+        name, prefetcher, frame_cache, loaders, columns, t
+) -> positions.MoleculeFrame:
+    """
+    Load the frames of `loaders` (see `_frame_loaders`) and interpolate
+    between them with weight `t` if there are two.
+    May be called from any thread.
+    """
+    frames = []
+    for load_step, key, load_frame in loaders:
+        try:
+            frames.append(_load_frame(
+                prefetcher, frame_cache, key, load_frame, columns))
+        except OSError as e:
+            raise _load_warning(name, load_step, e)
+    if len(frames) == 2:
+        with timing.span('interpolate'):
+            return interpolate.interpolate(*frames, t)
+    return frames[0]
+
+
+def _show_frame(obj, frame, scale, attr_type_by_name):
+    """Replace the molecules shown by `obj` with those in `frame`."""
+    # Codes of strings added while rendering would depend on the frames
+    # a render (worker) started at:
+    strings = util.string_dictionaries(obj, frozen=_rendering)
+    try:
+        if obj.pogona_molecule_reuse_mesh and obj.data.users == 1:
+            _update_mesh_in_place(
+                obj.data, frame, scale, attr_type_by_name, strings)
+        else:
+            _replace_mesh(obj, frame, scale, attr_type_by_name, strings)
+    except dictionary.UnknownStringsError as e:
+        render_errors.append(obj.name)
+        raise Warning(
+            f"The string table of object '{obj.name}' is incomplete: {e} "
+            "Build the string table again before rendering."
+        )
+    util.store_string_dictionaries(obj, strings)
+
+
+def show_decoded_step(
+        obj, scene, step: int, frame: positions.MoleculeFrame):
+    """
+    Show `frame`, time step `step` of `obj` as returned by the function
+    from `step_decoder`, and advance the time step of `obj` to it
+    without decoding it again.
+    """
+    _cancel_update(obj.name)
+    _show_frame(
+        obj, frame, 1 / scene.unit_settings.scale_length,
+        util.molecule_attribute_types(obj))
+    obj['_pogona_molecule_position_previous_step'] = step
+    obj['_pogona_molecule_position_previous_filter'] = _filter_key(
+        util.molecule_filter(obj, scene))
+    # Triggers a frame change, which finds the step already shown
+    # (unless the visualization settings changed in the meantime):
+    obj.pogona_molecule_positions_step = step
+
+
+def _filter_key(molecule_filter: Optional[filters.MoleculeFilter]) -> str:
+    """Identifies `molecule_filter` in the object's properties."""
+    return repr(molecule_filter)
+
+
+def _update_visualization(
+        obj, scene, prefetcher, frame_cache, columns, attr_type_by_name,
+        step, next_step, t, lod, molecule_filter):
+    """
+    Show time step `step` of `obj`, interpolated towards `next_step`
+    with weight `t` unless `next_step` is None,
+    filtered by `molecule_filter` and subsampled according to `lod`.
+    """
+    loaders = _frame_loaders(obj, step, next_step, lod, molecule_filter)
+    frame = _load_shown_frame(
+        obj.name, prefetcher, frame_cache, loaders, columns, t)
+    _show_frame(
+        obj, frame, 1 / scene.unit_settings.scale_length, attr_type_by_name)
+
+
+class _PendingUpdate(NamedTuple):
+    step: float
+    filter_key: str
+    future: concurrent.futures.Future
+    scale: float
+    attr_type_by_name: Dict[str, str]
+
+
+def _schedule_update(
+        obj, scene, prefetcher, frame_cache, columns, attr_type_by_name,
+        step, next_step, t, lod, molecule_filter, shown_step):
+    """
+    Like `_update_visualization`, but only start loading the frame(s) in
+    the background. `_apply_finished_updates` shows them once they are
+    loaded, unless another update of `obj` was scheduled in the
+    meantime.
+    """
+    global _update_pool
+    _cancel_update(obj.name)
+    loaders = _frame_loaders(obj, step, next_step, lod, molecule_filter)
+    if _update_pool is None:
+        _update_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=2,
+            thread_name_prefix='pogona-update',
+        )
+    future = _update_pool.submit(
+        _load_shown_frame,
+        obj.name, prefetcher, frame_cache, loaders, columns, t)
+    _pending_updates[obj.name] = _PendingUpdate(
+        shown_step,
+        _filter_key(molecule_filter),
+        future,
+        1 / scene.unit_settings.scale_length,
+        attr_type_by_name,
+    )
+    if not bpy.app.timers.is_registered(_apply_finished_updates):
+        bpy.app.timers.register(
+            _apply_finished_updates, first_interval=_APPLY_INTERVAL)
+
+
+def _cancel_update(name):
+    """Forget the scheduled update of the object named `name`, if any."""
+    update = _pending_updates.pop(name, None)
+    if update is not None:
+        # Only possible if it has not started yet, otherwise the result
+        # is ignored:
+        update.future.cancel()
+
+
+def _apply_finished_updates() -> Optional[float]:
+    """Timer showing the frames of finished updates on the main thread."""
+    for name, update in list(_pending_updates.items()):
+        if not update.future.done():
+            continue
+        del _pending_updates[name]
+        obj = bpy.data.objects.get(name)
+        if obj is None or update.future.cancelled():
+            continue
+        try:
+            frame = update.future.result()
+        except (Warning, OSError, ValueError) as e:
+            print(e)
+            continue
+        with timing.span('apply', object=name, step=update.step):
+            _show_frame(obj, frame, update.scale, update.attr_type_by_name)
+        obj['_pogona_molecule_position_previous_step'] = update.step
+        obj['_pogona_molecule_position_previous_filter'] = update.filter_key
+    if not _pending_updates:
+        # Unregisters the timer:
+        return None
+    return _APPLY_INTERVAL
+
+
+def steps_for_frames(obj, frames, path=None, scene=None) -> Set[int]:
+    """
+    The available time steps `obj` shows in `frames`, looked up in
+    `path` instead of `obj`'s positions path if given.
+    """
+    used = set()
+    for frame in frames:
+        requested_step = _step_at_frame(obj, frame, scene)
+        if requested_step is None:
+            requested_step = obj.pogona_molecule_positions_step
+        for step in _resolve_steps(obj, requested_step, path)[:2]:
+            if step is not None:
+                used.add(step)
+    return used
+
+
+def used_columns(obj) -> Dict[str, str]:
+    """
+    All columns `obj` may load with its current settings, in the
+    viewport and when rendering.
+    """
+    columns = _columns(
+        obj,
+        util.molecule_attribute_types(obj),
+        (
+            obj.pogona_molecule_viewport_fraction,
+            obj.pogona_molecule_viewport_max_points,
+        ) if (
+            obj.pogona_molecule_viewport_fraction < 1
+            or obj.pogona_molecule_viewport_max_points > 0
+        ) else None,
+    )
+    if obj.pogona_molecule_filter_object_ids.strip():
+        columns[filters.OBJECT_ID_COLUMN] = positions.KIND_INT
+    return columns
+
+
+def warm_up(scene, frames, workers: Optional[int] = None) -> int:
+    """
+    Decode the time steps that the visualizations in `scene` show in
+    `frames` into the binary cache ahead of time, in parallel.
+    Useful before rendering these frames.
+
+    :return: The number of time steps decoded.
+    """
+    jobs = dict()
+    for obj in _visualizations(scene):
+        try:
+            complete_string_tables(obj, workers)
+        except (OSError, ValueError) as e:
+            print(f"Could not build the string table of object "
+                  f"'{obj.name}': {e}")
+        if not obj.pogona_molecule_use_cache:
+            continue
+        # Including the filter columns, which rendering also reads:
+        columns = used_columns(obj)
+        try:
+            used = steps_for_frames(obj, frames, scene=scene)
+        except OSError:
+            continue
+        for step in used:
+            try:
+                key, load_frame = _frame_loader(obj, step)
+            except OSError:
+                continue
+            jobs[(key, tuple(columns.items()))] = (load_frame, columns)
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        for future in [
+            pool.submit(load_frame, columns)
+            for load_frame, columns in jobs.values()
+        ]:
+            try:
+                future.result()
+            except (OSError, ValueError) as e:
+                print(f"Could not warm up molecule positions: {e}")
+    return len(jobs)
+
+
+def attribute_statistic(
+        object_name: str, column: str, statistic: str = 'max', step=None):
+    """
+    The statistic ('count', 'min', 'max', or 'mean') of `column` of the
+    visualization object named `object_name` over its whole run, or in
+    time step `step`, as computed by `pogona.compute_attribute_statistics`.
+    Available to drivers as `pogona_statistic`, e.g., for normalizing
+    attributes in Geometry Nodes.
+    """
+    obj = bpy.data.objects[object_name]
+    if step is None:
+        return obj['pogona_attribute_statistics'][column][statistic]
+    by_column = statistics.lookup(
+        util.molecule_positions_directory(obj), int(step))
+    if by_column is None:
+        raise KeyError(
+            f"No current statistics for time step {step} of object "
+            f"'{object_name}'.")
+    return by_column[column][statistic]
+
+
+def scan_string_labels(obj, workers: Optional[int] = None):
+    """
+    All distinct values of the `STRING_HASH` attributes of `obj` in all
+    of its time steps, sorted.
+    """
+    names = [
+        attr_name for attr_name, attr_type
+        in util.molecule_attribute_types(obj).items()
+        if attr_type == 'STRING_HASH'
+    ]
+    columns = {name: positions.KIND_STRING for name in names}
+
+    def unique_labels(load_frame):
+        frame = load_frame(columns)
+        return {name: np.unique(frame.columns[name]) for name in names}
+
+    # Unlike `_frame_loader`, never subsample to the `max_molecules`
+    # preference, which would miss labels of dropped molecules:
+    path = util.molecule_positions_directory(obj)
+    container_path = container.find_container(path)
+    load_positions = (
+        cache.load_positions if obj.pogona_molecule_use_cache
+        else positions.load_positions
+    )
+    loaders = [
+        functools.partial(container.load_step, container_path, step)
+        if container_path is not None
+        else functools.partial(
+            load_positions, positions.positions_filename(path, step))
+        for step in steps.step_index(path).steps
+    ]
+    labels = {name: set() for name in names}
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        for result in pool.map(unique_labels, loaders):
+            for name, unique in result.items():
+                labels[name].update(unique.tolist())
+    return {name: sorted(values) for name, values in labels.items()}
+
+
+def complete_string_tables(
+        obj, workers: Optional[int] = None, force: bool = False) -> bool:
+    """
+    Add the strings of all time steps of `obj` to the tables of its
+    `STRING_HASH` attributes, in sorted order, so that their codes do
+    not depend on which time steps were shown or rendered first.
+    Only scans the time steps if the run changed since the last scan,
+    unless `force` is set.
+
+    :return: Whether the time steps were scanned.
+    """
+    strings = util.string_dictionaries(obj)
+    if not strings:
+        return False
+    path = util.molecule_positions_directory(obj)
+    index = steps.step_index(path)
+    version = f'{path}:{len(index)}:{index.min}:{index.max}'
+    if not force and obj.get('_pogona_string_labels_version') == version:
+        return False
+    labels = scan_string_labels(obj, workers)
+    for attr_name, table in strings.items():
+        table.add(labels[attr_name])
+    util.store_string_dictionaries(obj, strings)
+    obj['_pogona_string_labels_version'] = version
+    return True
 
 
 @persistent
 def _update_all_molecule_visualizations(scene, depsgraph):
-    for obj in scene.objects:
+    global _previous_frame
+    log_level = util.preference(bpy.context, 'molecules_log_level', 'TIMING')
+    timing.recorder.enabled = log_level != 'OFF'
+    verbose = log_level == 'VERBOSE'
+    prefetcher = _get_prefetcher(bpy.context)
+    frame_cache = _get_frame_cache(bpy.context)
+    direction = (
+        -1 if _previous_frame is not None
+        and scene.frame_current < _previous_frame
+        else 1
+    )
+    _previous_frame = scene.frame_current
+    visualizations = _visualizations(scene)
+    if prefetcher is not None:
+        # Keep the prefetched steps of all visualizations, set before
+        # scheduling so that they do not evict each other's:
+        prefetcher.capacity = (
+            max(1, len(visualizations))
+            * util.preference(bpy.context, 'prefetch_depth', 4)
+        )
+
+    for obj in visualizations:
         # When rendering, it can happen that key-framed properties
         # are not updated in the 'original datablock',
         # hence we need to get the 'evaluated version'
@@ -36,120 +862,134 @@ def _update_all_molecule_visualizations(scene, depsgraph):
         # TODO: this requires frame_change_post, does not work with …pre.
         #  Does this mean we're one frame off?
 
-        if not obj.get('pogona_molecule_visualization_flag', False):
+        attr_type_by_name = util.molecule_attribute_types(obj)
+        lod = _level_of_detail(obj)
+        columns = _columns(obj, attr_type_by_name, lod)
+        molecule_filter = util.molecule_filter(obj_eval, scene)
+        try:
+            missing = missing_columns(obj, dict(
+                molecule_filter.columns() if molecule_filter else {},
+                **columns))
+        except OSError as e:
+            raise Warning(
+                "Could not find the molecule positions path of "
+                f"object '{obj.name}': {e}"
+            )
+        if list(obj.get('_pogona_missing_columns', [])) != missing:
+            obj['_pogona_missing_columns'] = missing
+        if missing:
+            # Fail before scheduling any work:
+            raise Warning(
+                f"The molecule positions files of object '{obj.name}' "
+                f"have no column(s) for {', '.join(missing)}. "
+                "Skipping molecule positions update."
+            )
+        if prefetcher is not None:
+            _prefetch_upcoming_steps(
+                prefetcher, frame_cache, obj_eval, scene, direction, columns,
+                lod, molecule_filter)
+
+        requested_step = obj_eval.pogona_molecule_positions_step
+        if (
+                obj.pogona_molecule_interpolate
+                or obj.pogona_molecule_time_mapping
+        ):
+            mapped_step = _step_at_frame(
+                obj_eval, scene.frame_current + scene.frame_subframe, scene)
+            if mapped_step is not None:
+                requested_step = mapped_step
+        try:
+            step, next_step, t = _resolve_steps(obj_eval, requested_step)
+        except OSError as e:
+            raise Warning(
+                "Could not find the molecule positions path of "
+                f"object '{obj.name}': {e}"
+            )
+        if step is None:
+            raise Warning(
+                f"No molecule positions for time step {requested_step} "
+                f"of object '{obj.name}'. "
+                "Skipping molecule positions update."
+            )
+
+        # The (interpolated) time step that is going to be shown:
+        shown_step = (
+            step if next_step is None
+            else step + t * (next_step - step)
+        )
+        force_update = obj_eval.get(
+            '_pogona_molecule_position_force_update', True)
+        # The box of a bounds object moves without changing any setting
+        # of this object:
+        filter_key = _filter_key(molecule_filter)
+        pending = _pending_updates.get(obj.name)
+        if (
+                pending is not None
+                and pending.step == shown_step
+                and pending.filter_key == filter_key
+                and not force_update
+        ):
+            # Already being loaded in the background.
             continue
         if (
-                obj_eval.pogona_molecule_positions_step == obj_eval.get(
+                shown_step == obj_eval.get(
                     '_pogona_molecule_position_previous_step'
                 )
+                and filter_key == obj_eval.get(
+                    '_pogona_molecule_position_previous_filter'
+                )
                 and not obj_eval.get(
                     '_pogona_molecule_position_force_update',
                     True
                 )
         ):
-            # Don't update if the object's time step hasn't changed.
-            print(f"time step of {obj.name} hasn't changed; "
-                  f"old: "
-                  f"{obj_eval.get('_pogona_molecule_position_previous_step')},"
-                  f" new: {obj_eval.pogona_molecule_positions_step}, "
-                  f"force update: "
-                  f"{obj_eval.get('_pogona_molecule_position_force_update')}")
+            # Don't update if the object's time step hasn't changed,
+            # and drop a background update for another time step, e.g.,
+            # after scrubbing back to the step that is shown:
+            _cancel_update(obj.name)
+            if verbose:
+                previous_step = obj_eval.get(
+                    '_pogona_molecule_position_previous_step')
+                force_update = obj_eval.get(
+                    '_pogona_molecule_position_force_update')
+                print(f"time step of {obj.name} hasn't changed; "
+                      f"old: {previous_step}, new: {shown_step}, "
+                      f"force update: {force_update}")
             continue
-        print(
-            f"Updating molecule visualizations, frame {scene.frame_current}, "
-            f"object '{obj.name}'."
-        )
-
-        mesh = bpy.data.meshes.new(obj.name)
-        verts = []
-
-        # Data for Geometry Nodes attributes:
-        attr_data = {
-            item.pogona_particle_attr: []
-            for item in obj.pogona_molecule_attributes
-        }
-        attr_type_by_name = {
-            item.pogona_particle_attr: item.pogona_particle_attr_type
-            for item in obj.pogona_molecule_attributes
-        }
-
-        scale = 1 / scene.unit_settings.scale_length
-        filename = bpy.path.abspath(os.path.join(
-            obj.pogona_molecule_positions_path,
-            f'positions.csv.{obj_eval.pogona_molecule_positions_step}'
-        ))
-        # bpy.path.abspath may still produce paths like
-        # `/home/user/path/to/blendfile/../../../selected.file`
-        # Can be resolved with os.path.abspath:
-        filename = os.path.abspath(filename)
-        try:
-            with open(filename, 'r') as csv_file:
-                reader = csv.DictReader(csv_file)
-                for row in reader:
-                    verts.append(mathutils.Vector((
-                        float(row['x']) * scale,
-                        float(row['y']) * scale,
-                        float(row['z']) * scale
-                    )))
-
-                    for attr_name, attr_type in attr_type_by_name.items():
-                        if attr_name not in row:
-                            raise ValueError(
-                                f"Particle positions file {filename} "
-                                f"has no column(s) for {attr_name}."
-                            )
-                        if attr_type == 'INT':
-                            attr_data[attr_name].append(
-                                int(row[attr_name])
-                            )
-                        elif attr_type == 'FLOAT':
-                            attr_data[attr_name].append(
-                                float(row[attr_name])
-                            )
-                        elif attr_type == 'STRING':
-                            attr_data[attr_name].append(row[attr_name])
-                        elif attr_type == 'STRING_HASH':
-                            attr_data[attr_name].append(
-                                hash(row[attr_name])
-                            )
-                        elif attr_type == 'FLOAT_VECTOR':
-                            vec = (
-                                float(row[attr_name + '_x']),
-                                float(row[attr_name + '_y']),
-                                float(row[attr_name + '_z']),
-                            )
-                            attr_data[attr_name].append(vec)
-
-        except OSError as e:
-            raise Warning(
-                f"Could not open file '{filename}'. "
-                "Skipping molecule positions update. "
-                f"Exception: {e}"
+        if verbose:
+            print(
+                "Updating molecule visualizations, "
+                f"frame {scene.frame_current}, object '{obj.name}'."
             )
-        mesh.from_pydata(verts, [], [])
-        old_mesh = obj.data
-        # Transfer the first material to the new mesh:
-        if len(old_mesh.materials) > 0:
-            tmp_material = old_mesh.materials[0]
-            mesh.materials.append(tmp_material)
-
-        mesh.update()
-        obj.data = mesh
-        util.delete_mesh(old_mesh)
 
-        for attr_name, attr_type in attr_type_by_name.items():
-            obj.data.attributes.new(
-                name=attr_name,
-                type=attr_type if attr_type != 'STRING_HASH' else 'INT',
-                domain='POINT'
+        if (
+                obj.pogona_molecule_async_update
+                and not _rendering
+                and not bpy.app.background
+        ):
+            # Keep showing the previous step until this one is loaded:
+            _schedule_update(
+                obj, scene, prefetcher, frame_cache, columns,
+                attr_type_by_name, step, next_step, t, lod, molecule_filter,
+                shown_step
             )
-            obj.data.attributes[attr_name].data.foreach_set(
-                'vector' if attr_type == 'FLOAT_VECTOR' else 'value',
-                attr_data[attr_name],
+            obj['_pogona_molecule_position_force_update'] = False
+            continue
+
+        _cancel_update(obj.name)
+        with timing.span(
+                'update',
+                object=obj.name,
+                frame=scene.frame_current,
+                step=shown_step,
+        ):
+            _update_visualization(
+                obj, scene, prefetcher, frame_cache, columns,
+                attr_type_by_name, step, next_step, t, lod, molecule_filter
             )
 
-        obj['_pogona_molecule_position_previous_step'] = (
-            obj_eval.pogona_molecule_positions_step)
+        obj['_pogona_molecule_position_previous_step'] = shown_step
+        obj['_pogona_molecule_position_previous_filter'] = filter_key
         obj['_pogona_molecule_position_force_update'] = False
 
 
@@ -168,17 +1008,99 @@ def _lock_ui_during_render(scene):
     bpy.context.scene.render.use_lock_interface = True
 
 
+def _force_level_of_detail_update():
+    for obj in _visualizations(bpy.context.scene):
+        if (
+                obj.pogona_molecule_viewport_fraction < 1
+                or obj.pogona_molecule_viewport_max_points > 0
+        ):
+            obj['_pogona_molecule_position_force_update'] = True
+
+
+def _cancel_all_updates():
+    for name in list(_pending_updates):
+        _cancel_update(name)
+        # The previous step is still shown:
+        obj = bpy.data.objects.get(name)
+        if obj is not None:
+            obj['_pogona_molecule_position_force_update'] = True
+
+
+@persistent
+def _show_all_molecules_for_render(scene, *args):
+    """
+    Switch visualizations with a viewport level of detail to all
+    molecules for rendering (and back afterwards).
+    """
+    global _rendering
+    _rendering = True
+    render_errors.clear()
+    # Rendered frames must not depend on when background updates finish:
+    _cancel_all_updates()
+    for obj in _visualizations(scene):
+        try:
+            complete_string_tables(obj)
+        except (OSError, ValueError) as e:
+            print(f"Could not build the string table of object "
+                  f"'{obj.name}': {e}")
+    _force_level_of_detail_update()
+    # Rendering a single frame does not change the frame:
+    _update_all_molecule_visualizations(
+        scene, bpy.context.evaluated_depsgraph_get())
+
+
+@persistent
+def _restore_level_of_detail(scene, *args):
+    global _rendering
+    _rendering = False
+    # Takes effect on the next frame change:
+    _force_level_of_detail_update()
+
+
 def register_handlers():
     bpy.app.handlers.frame_change_post.append(
         _update_all_molecule_visualizations
     )
     bpy.app.handlers.render_pre.append(_lock_ui_during_render)
+    bpy.app.driver_namespace['pogona_statistic'] = attribute_statistic
+    bpy.app.handlers.render_init.append(_show_all_molecules_for_render)
+    bpy.app.handlers.render_complete.append(_restore_level_of_detail)
+    bpy.app.handlers.render_cancel.append(_restore_level_of_detail)
+    for handlers in (
+            bpy.app.handlers.load_post,
+            bpy.app.handlers.undo_post,
+            bpy.app.handlers.redo_post,
+    ):
+        handlers.append(_rebuild_registry_handler)
     # Keep in mind that render_pre is run before every frame when
     # rendering an animation.
 
 
 def unregister_handlers():
+    global _frame_cache, _prefetcher, _update_pool
     bpy.app.handlers.frame_change_post.remove(
         _update_all_molecule_visualizations
     )
     bpy.app.handlers.render_pre.remove(_lock_ui_during_render)
+    bpy.app.driver_namespace.pop('pogona_statistic', None)
+    bpy.app.handlers.render_init.remove(_show_all_molecules_for_render)
+    bpy.app.handlers.render_complete.remove(_restore_level_of_detail)
+    bpy.app.handlers.render_cancel.remove(_restore_level_of_detail)
+    for handlers in (
+            bpy.app.handlers.load_post,
+            bpy.app.handlers.undo_post,
+            bpy.app.handlers.redo_post,
+    ):
+        handlers.remove(_rebuild_registry_handler)
+    _cancel_all_updates()
+    if bpy.app.timers.is_registered(_apply_finished_updates):
+        bpy.app.timers.unregister(_apply_finished_updates)
+    if _update_pool is not None:
+        _update_pool.shutdown(wait=False)
+        _update_pool = None
+    if _prefetcher is not None:
+        _prefetcher.shutdown()
+        _prefetcher = None
+    if _frame_cache is not None:
+        _frame_cache.clear()
+        _frame_cache = None
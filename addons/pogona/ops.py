@@ -21,6 +21,21 @@ import bpy
 import bmesh
 import mathutils
 import bpy_extras
+from bpy_extras.io_utils import ExportHelper
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from . import export
+from . import molecules_visualization
+from . import util
+from .trajectory import container
+from .trajectory import positions
+from .trajectory import progress
+from .trajectory import statistics
+from .trajectory import timing
 
 
 def _undo_unit_scale(context, bm):
@@ -93,10 +108,62 @@ def _create_cross_mesh(context, mesh, bm):
     mesh.from_pydata(verts, edges, [])
 
 
-def _create_pogona_object(self, context, create_mesh_func):
-    mesh = bpy.data.meshes.new(f"Pogona {self.bl_label}")
+_shape_mesh_functions = {
+    'CUBE': _create_cube_mesh,
+    'CYLINDER': _create_cylinder_mesh,
+    'SPHERE': _create_sphere_mesh,
+    'POINT': _create_cross_mesh,
+}
+
+# Names of the shared shape meshes by shape and unit scale. Blender
+# appends `.001` etc. if another mesh already has the name we ask for:
+_shape_mesh_names = dict()
+
+
+def shape_mesh(context, shape: str) -> bpy.types.Mesh:
+    """
+    The mesh for `shape` at the scene's unit scale.
+    All objects of the same shape share this mesh; their size is set by
+    the object's scale. Created on first use and kept in the .blend file
+    as long as any object uses it.
+    """
+    if shape not in _shape_mesh_functions:
+        # shape in ('POINT', 'NONE'):
+        shape = 'POINT'
+    unit_scale = context.scene.unit_settings.scale_length
+
+    def is_shared(mesh):
+        return (
+            mesh is not None
+            and mesh.get('_pogona_shape') == shape
+            and mesh.get('_pogona_unit_scale') == unit_scale
+        )
+
+    name = f"Pogona {shape.title()} ({unit_scale:g} m)"
+    mesh = bpy.data.meshes.get(
+        _shape_mesh_names.get((shape, unit_scale), name))
+    if not is_shared(mesh):
+        # E.g., after loading a file, or if the user renamed the mesh:
+        mesh = next(filter(is_shared, bpy.data.meshes), None)
+    if mesh is not None:
+        _shape_mesh_names[(shape, unit_scale)] = mesh.name
+        return mesh
+    mesh = bpy.data.meshes.new(name)
+    _shape_mesh_names[(shape, unit_scale)] = mesh.name
     bm = bmesh.new()
-    create_mesh_func(context, mesh, bm)
+    _shape_mesh_functions[shape](context, mesh, bm)
+    bm.free()
+    mesh['_pogona_shape'] = shape
+    mesh['_pogona_unit_scale'] = unit_scale
+    return mesh
+
+
+def _is_shape_mesh(mesh: bpy.types.Mesh) -> bool:
+    return '_pogona_shape' in mesh
+
+
+def _create_pogona_object(self, context, shape):
+    mesh = shape_mesh(context, shape)
     bpy_extras.object_utils.object_data_add(context, mesh, operator=None)
 
     obj = context.active_object
@@ -112,6 +179,7 @@ def _create_pogona_object(self, context, create_mesh_func):
     scale = context.scene.unit_settings.scale_length
     obj.scale = [scale, scale, scale]
 
+    obj.pogona_shape = shape
     return {'FINISHED'}
 
 
@@ -122,24 +190,24 @@ class PogonaRepresentationShapeUpdate(bpy.types.Operator):
 
     def execute(self, context):
         obj = context.active_object
+        old_mesh = obj.data
 
         if (obj.pogona_representation.same_as_shape
                 or obj.pogona_representation.linked_object is None):
-            mesh = bpy.data.meshes.new(obj.name)
-            bm = bmesh.new()
-            if obj.pogona_shape == 'CUBE':
-                _create_cube_mesh(context, mesh, bm)
-            elif obj.pogona_shape == 'CYLINDER':
-                _create_cylinder_mesh(context, mesh, bm)
-            elif obj.pogona_shape == 'SPHERE':
-                _create_sphere_mesh(context, mesh, bm)
-            else:
-                # obj.pogona_shape in ('POINT', 'NONE'):
-                _create_cross_mesh(context, mesh, bm)
-            obj.data = mesh
+            obj.data = shape_mesh(context, obj.pogona_shape)
         else:
             obj.data = obj.pogona_representation.linked_object.data
 
+        # Remove the object's previous mesh if nothing else uses it,
+        # e.g., one created per object by earlier versions:
+        if (
+                isinstance(old_mesh, bpy.types.Mesh)
+                and old_mesh != obj.data
+                and old_mesh.users == 0
+                and not _is_shape_mesh(old_mesh)
+        ):
+            util.delete_mesh(old_mesh)
+
         return {'FINISHED'}
 
 
@@ -172,9 +240,7 @@ class PogonaAddCube(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
-        _create_pogona_object(self, context, _create_cube_mesh)
-        obj = context.active_object
-        obj.pogona_shape = 'CUBE'
+        _create_pogona_object(self, context, 'CUBE')
         return {'FINISHED'}
 
 
@@ -185,9 +251,7 @@ class PogonaAddCylinder(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
-        _create_pogona_object(self, context, _create_cylinder_mesh)
-        obj = context.active_object
-        obj.pogona_shape = 'CYLINDER'
+        _create_pogona_object(self, context, 'CYLINDER')
         return {'FINISHED'}
 
 
@@ -198,9 +262,7 @@ class PogonaAddSphere(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
-        _create_pogona_object(self, context, _create_sphere_mesh)
-        obj = context.active_object
-        obj.pogona_shape = 'SPHERE'
+        _create_pogona_object(self, context, 'SPHERE')
         return {'FINISHED'}
 
 
@@ -211,9 +273,7 @@ class PogonaAddPoint(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
-        _create_pogona_object(self, context, _create_cross_mesh)
-        obj = context.active_object
-        obj.pogona_shape = 'POINT'
+        _create_pogona_object(self, context, 'POINT')
         return {'FINISHED'}
 
 
@@ -239,5 +299,358 @@ class PogonaAddMoleculesVisualization(bpy.types.Operator):
         # Mark this object so we can later check whether to enable
         # relevant UI elements or not:
         obj['pogona_molecule_visualization_flag'] = True
+        molecules_visualization.register_visualization(obj)
+
+        return {'FINISHED'}
+
+
+def run_tool(module: str, *args) -> subprocess.Popen:
+    """
+    Run `python -m <module> <args>` with Blender's Python interpreter,
+    where `module` is a package or module of this add-on that does not
+    depend on Blender.
+    This is how process pools are used from within Blender: worker
+    processes cannot import this add-on, since `bpy` is not available
+    to them.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (
+        os.path.dirname(os.path.abspath(__file__)),
+        env.get('PYTHONPATH'),
+    )))
+    return subprocess.Popen(
+        [sys.executable, '-m', module, *args],
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+
+def run_trajectory_tool(*args) -> subprocess.Popen:
+    """Run `python -m trajectory <args>`, see `run_tool`."""
+    return run_tool('trajectory', *args)
+
+
+class _VisualizationOperator:
+    """
+    Mix-in for operators on the molecule positions of the active
+    visualization object.
+    """
+
+    @classmethod
+    def poll(cls, context):
+        obj = context.object
+        return (
+            obj is not None
+            and obj.get('pogona_molecule_visualization_flag', False)
+            and obj.pogona_molecule_positions_path != ''
+        )
+
+
+class _ToolOperator:
+    """
+    Mix-in for modal operators that run a command-line tool (see
+    `run_tool`) reporting its progress with `trajectory.progress`,
+    showing its progress until it exits.
+    """
+
+    def _start(self, context, process: subprocess.Popen):
+        self._process = process
+        self._progress = (0, 0)
+        self._output = []
+        self._errors = []
+        # Read the pipes in the background so they never fill up:
+        self._readers = [
+            threading.Thread(target=self._read_progress, daemon=True),
+            threading.Thread(target=self._read_errors, daemon=True),
+        ]
+        for reader in self._readers:
+            reader.start()
+
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.25, window=context.window)
+        wm.modal_handler_add(self)
+        wm.progress_begin(0, 1)
+        return {'RUNNING_MODAL'}
+
+    def _read_progress(self):
+        for line in self._process.stdout:
+            done_total = progress.parse(line)
+            if done_total is not None:
+                self._progress = done_total
+            else:
+                self._output.append(line.rstrip())
+
+    def _read_errors(self):
+        for line in self._process.stderr:
+            self._errors.append(line.rstrip())
+
+    def _finished(self, context):
+        """Called after the tool exited successfully."""
+        return {'FINISHED'}
+
+    def modal(self, context, event):
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        wm = context.window_manager
+        done, total = self._progress
+        wm.progress_update(done / total if total else 0)
+        if self._process.poll() is None:
+            return {'PASS_THROUGH'}
+
+        for reader in self._readers:
+            reader.join()
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        if self._process.returncode != 0:
+            self.report(
+                {'ERROR'},
+                f"{self.bl_label} failed:\n"
+                + "\n".join(self._errors[-10:])
+            )
+            return {'CANCELLED'}
+        return self._finished(context)
+
+
+class PogonaBuildMoleculesCache(
+        _VisualizationOperator, _ToolOperator, bpy.types.Operator):
+    """
+    Decode all molecule positions files of this visualization into the
+    binary cache, using one process per CPU
+    """
+    bl_idname = 'pogona.build_molecules_cache'
+    bl_label = "Build Cache"
+
+    def execute(self, context):
+        obj = context.object
+        columns = molecules_visualization.used_columns(obj)
+        return self._start(context, run_trajectory_tool(
+            'build-cache',
+            util.molecule_positions_directory(obj),
+            '--columns', json.dumps(columns),
+        ))
+
+    def _finished(self, context):
+        _, total = self._progress
+        self.report({'INFO'}, f"Cached {total} molecule positions files.")
+        return {'FINISHED'}
+
+
+class PogonaComputeAttributeStatistics(
+        _VisualizationOperator, _ToolOperator, bpy.types.Operator):
+    """
+    Compute count, minimum, maximum, mean, and a histogram of the
+    particle attributes in every time step and over the whole run,
+    using one process per CPU
+    """
+    bl_idname = 'pogona.compute_attribute_statistics'
+    bl_label = "Compute Statistics"
+
+    def execute(self, context):
+        obj = context.object
+        self._object_name = obj.name
+        columns = positions.columns_for_attributes(
+            util.molecule_attribute_types(obj)
+        )
+        return self._start(context, run_trajectory_tool(
+            'statistics',
+            util.molecule_positions_directory(obj),
+            '--columns', json.dumps(columns),
+        ))
+
+    def _finished(self, context):
+        obj = bpy.data.objects.get(self._object_name)
+        if obj is None:
+            return {'CANCELLED'}
+        util.store_attribute_statistics(obj, statistics.run_statistics(
+            statistics.read(util.molecule_positions_directory(obj))
+        ))
+        self.report({'INFO'}, "Stored the attribute statistics in the "
+                              "object's `pogona_attribute_statistics` "
+                              "custom property.")
+        return {'FINISHED'}
+
+
+class PogonaBakeMolecules(
+        _VisualizationOperator, _ToolOperator, bpy.types.Operator):
+    """
+    Write the time steps this visualization shows in the scene's frame
+    range, with only the columns it uses, into a trajectory container
+    next to the .blend file, and read from there from now on
+    """
+    bl_idname = 'pogona.bake_molecules'
+    bl_label = "Bake Molecules"
+
+    compression: bpy.props.EnumProperty(
+        name="Compression",
+        items=(
+            ('none', "None", "Fastest to read, memory-mapped"),
+            ('zlib', "zlib", "Smaller, fast to decompress"),
+            ('lzma', "LZMA", "Smallest, slow to decompress"),
+        ),
+        default='none',
+    )
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        obj = context.object
+        scene = context.scene
+        if not bpy.data.filepath:
+            self.report({'ERROR'}, "Save the .blend file first.")
+            return {'CANCELLED'}
+        source = util.molecule_positions_directory(obj, baked=False)
+        if container.find_container(source) is not None:
+            self.report(
+                {'ERROR'},
+                f"Object '{obj.name}' already reads a trajectory container."
+            )
+            return {'CANCELLED'}
+        try:
+            used_steps = molecules_visualization.steps_for_frames(
+                obj, range(scene.frame_start, scene.frame_end + 1), source)
+        except OSError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        if not used_steps:
+            self.report({'ERROR'}, "No time steps to bake.")
+            return {'CANCELLED'}
+
+        if not obj.pogona_molecule_bake_path:
+            # Bypass the update callback, this does not change anything
+            # until the bake is used:
+            obj['pogona_molecule_bake_path'] = (
+                f'//pogona_bake/{bpy.path.clean_name(obj.name)}'
+                '.pogona-trajectory'
+            )
+        output = os.path.abspath(
+            bpy.path.abspath(obj.pogona_molecule_bake_path))
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        self._object_name = obj.name
+        return self._start(context, run_trajectory_tool(
+            'convert',
+            source,
+            '--output', output,
+            '--steps', ','.join(map(str, sorted(used_steps))),
+            '--columns', json.dumps(
+                molecules_visualization.used_columns(obj)),
+            '--compression', self.compression,
+        ))
+
+    def _finished(self, context):
+        obj = bpy.data.objects.get(self._object_name)
+        if obj is None:
+            return {'CANCELLED'}
+        obj['_pogona_molecule_position_force_update'] = True
+        obj.pogona_molecule_use_bake = True
+        self.report({'INFO'}, self._output[-1] if self._output else "Done.")
+        return {'FINISHED'}
+
+
+class PogonaExportSweep(_ToolOperator, bpy.types.Operator):
+    """
+    Write a scene.yaml file for every combination of parameter values
+    in a sweep specification, using one process per CPU
+    """
+    bl_idname = 'pogona.export_sweep'
+    bl_label = "Pogona Scene Sweep"
+
+    spec_path: bpy.props.StringProperty(
+        name="Sweep Specification",
+        description="YAML file listing the parameters to vary "
+                    "(see the documentation of the `sweep` module)",
+        subtype='FILE_PATH',
+    )
+    directory: bpy.props.StringProperty(
+        name="Output Directory",
+        subtype='DIR_PATH',
+    )
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        if not self.spec_path or not self.directory:
+            self.report(
+                {'ERROR'}, "Select a sweep specification and a directory.")
+            return {'CANCELLED'}
+        # The variants are based on the scene as it would be exported:
+        fd, self._base_path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(dict(
+                components=export.scene_components(self, context)
+            ), f)
+        return self._start(context, run_tool(
+            'sweep',
+            bpy.path.abspath(self.spec_path),
+            '--base', self._base_path,
+            '--output-dir', bpy.path.abspath(self.directory),
+        ))
+
+    def modal(self, context, event):
+        result = super().modal(context, event)
+        if result != {'PASS_THROUGH'}:
+            os.remove(self._base_path)
+        return result
+
+    def _finished(self, context):
+        self.report({'INFO'}, self._output[-1] if self._output else "Done.")
+        return {'FINISHED'}
+
+
+class PogonaBuildStringTable(_VisualizationOperator, bpy.types.Operator):
+    """
+    Add the strings of all time steps to the tables of this
+    visualization's Hashed String attributes, in sorted order, so their
+    codes do not depend on which time steps were shown first
+    """
+    bl_idname = 'pogona.build_string_table'
+    bl_label = "Build String Table"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        obj = context.object
+        try:
+            molecules_visualization.complete_string_tables(obj, force=True)
+        except (OSError, ValueError) as e:
+            self.report({'ERROR'}, f"Could not read all time steps: {e}")
+            return {'CANCELLED'}
+        strings = util.string_dictionaries(obj)
+        self.report({'INFO'}, ", ".join(
+            f"{attr_name}: {len(table)} strings"
+            for attr_name, table in strings.items()
+        ) or "No Hashed String attributes.")
+        return {'FINISHED'}
+
+
+class PogonaExportMoleculesTimingTrace(bpy.types.Operator, ExportHelper):
+    """
+    Save the recorded timing of molecule visualization updates
+    as a Chrome trace (open in chrome://tracing or ui.perfetto.dev)
+    """
+    bl_idname = 'pogona.export_molecules_timing_trace'
+    bl_label = "Export Timing Trace"
 
+    # Used by ExportHelper:
+    filename_ext = '.json'
+
+    filter_glob: bpy.props.StringProperty(
+        default='*.json',
+        options={'HIDDEN'},
+        maxlen=255,
+    )
+
+    @classmethod
+    def poll(cls, context):
+        return len(timing.recorder.events) > 0
+
+    def execute(self, context):
+        with open(self.filepath, 'w') as f:
+            json.dump(timing.recorder.chrome_trace(), f)
+        self.report(
+            {'INFO'},
+            f"Saved {len(timing.recorder.events)} timing events."
+        )
         return {'FINISHED'}
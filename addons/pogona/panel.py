@@ -18,6 +18,10 @@
 # along with Pogona.  If not, see <https://www.gnu.org/licenses/>.import bpy
 
 import bpy
+from . import molecules_visualization
+from . import ops
+from . import util
+from .trajectory import positions
 
 
 class PogonaPanel(bpy.types.Panel):
@@ -105,6 +109,53 @@ class PogonaMoleculesVisualizationPanel(bpy.types.Panel):
         row.prop(obj, 'pogona_molecule_positions_path')
         row = layout.row()
         row.prop(obj, 'pogona_molecule_positions_step')
+        row.prop(obj, 'pogona_molecule_follow', icon='PLAY')
+        row.enabled = not obj.pogona_molecule_time_mapping
+        box = layout.box()
+        box.prop(obj, 'pogona_molecule_time_mapping')
+        if obj.pogona_molecule_time_mapping:
+            box.prop(obj, 'pogona_molecule_time_step')
+            box.prop(obj, 'pogona_molecule_output_interval')
+            box.prop(obj, 'pogona_molecule_time_offset')
+            box.prop(obj, 'pogona_molecule_playback_speed')
+            mapping = util.time_mapping(obj, context.scene)
+            frame = context.scene.frame_current
+            box.label(
+                text=f"Simulation time {mapping.time_at(frame):.6g} s, "
+                     f"time step {mapping.step_at(frame)}",
+                icon='TIME',
+            )
+        row = layout.row()
+        row.prop(obj, 'pogona_molecule_step_lookup')
+        row.enabled = not obj.pogona_molecule_interpolate
+        row = layout.row()
+        row.prop(obj, 'pogona_molecule_interpolate')
+        row = layout.row()
+        row.prop(obj, 'pogona_molecule_reuse_mesh')
+        row.prop(obj, 'pogona_molecule_async_update')
+        row = layout.row()
+        row.prop(obj, 'pogona_molecule_viewport_fraction')
+        row.prop(obj, 'pogona_molecule_viewport_max_points')
+        box = layout.box()
+        box.label(text="Filter")
+        box.prop(obj, 'pogona_molecule_filter_region')
+        if obj.pogona_molecule_filter_region == 'BOX':
+            box.prop(obj, 'pogona_molecule_filter_box_min')
+            box.prop(obj, 'pogona_molecule_filter_box_max')
+        elif obj.pogona_molecule_filter_region == 'OBJECT':
+            box.prop(obj, 'pogona_molecule_filter_object')
+        box.prop(obj, 'pogona_molecule_filter_object_ids')
+        row = layout.row()
+        row.prop(obj, 'pogona_molecule_use_cache')
+        row.operator(
+            ops.PogonaBuildMoleculesCache.bl_idname,
+            icon='FILE_CACHE',
+        )
+        row = layout.row()
+        row.prop(obj, 'pogona_molecule_bake_path')
+        row = layout.row()
+        row.prop(obj, 'pogona_molecule_use_bake')
+        row.operator(ops.PogonaBakeMolecules.bl_idname, icon='EXPORT')
         row = layout.row()
         row.template_list(
             'POGONA_UL_ParticleAttrUIList',
@@ -114,6 +165,13 @@ class PogonaMoleculesVisualizationPanel(bpy.types.Panel):
             active_dataptr=obj,  # where to find the index
             active_propname='pogona_molecule_attributes_selected_index',
         )
+        # Updated by the update callbacks and the frame change handler:
+        missing = obj.get('_pogona_missing_columns', [])
+        if missing:
+            layout.label(
+                text=f"Missing column(s): {', '.join(missing)}",
+                icon='ERROR',
+            )
         row = layout.row()
         row.operator(
             'pogona_particle_attr_list.new_item',
@@ -123,6 +181,7 @@ class PogonaMoleculesVisualizationPanel(bpy.types.Panel):
             'pogona_particle_attr_list.delete_item',
             text="Remove",
         )
+        row.operator(ops.PogonaComputeAttributeStatistics.bl_idname)
         if (
                 obj.pogona_molecule_attributes_selected_index >= 0
                 and len(obj.pogona_molecule_attributes) > 0
@@ -135,6 +194,66 @@ class PogonaMoleculesVisualizationPanel(bpy.types.Panel):
             row.prop(item, 'pogona_particle_attr')
             row = layout.row()
             row.prop(item, 'pogona_particle_attr_type')
+            # Statistics are stored per column, e.g., `name_x`, `name_y`,
+            # and `name_z` for vectors:
+            attr_name = item.pogona_particle_attr
+            by_column = obj.get('pogona_attribute_statistics', {})
+            for name in positions.columns_for_attributes(
+                    {attr_name: item.pogona_particle_attr_type}):
+                column = by_column.get(name)
+                if column is None or (
+                        name in positions.POSITION_COLUMNS
+                        and name != attr_name):
+                    continue
+                prefix = "Run" if name == attr_name else f"Run {name}"
+                layout.label(
+                    text=f"{prefix}: min {column['min']:.6g}, "
+                         f"max {column['max']:.6g}, "
+                         f"mean {column['mean']:.6g}",
+                    icon='INFO',
+                )
+            if item.pogona_particle_attr_type == 'STRING_HASH':
+                labels = obj.get('pogona_string_labels', {}).get(
+                    item.pogona_particle_attr, ())
+                box = layout.box()
+                row = box.row()
+                row.label(text=f"{len(labels)} strings")
+                row.operator(ops.PogonaBuildStringTable.bl_idname)
+                for code, label in enumerate(labels[:20]):
+                    box.label(text=f"{code}: {label}")
+                if len(labels) > 20:
+                    box.label(text="…")
+
+        stats = molecules_visualization.frame_cache_statistics()
+        if stats is not None:
+            hit_rate, resident_bytes, evictions = stats
+            layout.label(
+                text=f"Frame cache: {hit_rate:.0%} hit rate, "
+                     f"{resident_bytes / 2 ** 20:.1f} MiB, "
+                     f"{evictions} evictions",
+                icon='INFO',
+            )
+        summary = molecules_visualization.timing_summary()
+        if summary:
+            box = layout.box()
+            box.label(text="Recent updates (mean / max):", icon='TIME')
+            for stage, (count, mean, maximum) in summary.items():
+                box.label(
+                    text=f"{stage}: {mean * 1e3:.1f} / {maximum * 1e3:.1f} ms "
+                         f"({count}×)"
+                )
+            box.operator(
+                ops.PogonaExportMoleculesTimingTrace.bl_idname,
+                icon='EXPORT',
+            )
+        stats = molecules_visualization.prefetch_statistics()
+        if stats is not None:
+            hits, misses, hit_rate = stats
+            layout.label(
+                text=f"Prefetch: {hits} hits, {misses} misses "
+                     f"({hit_rate:.0%} hit rate)",
+                icon='INFO',
+            )
 
 
 class POGONA_UL_ParticleAttrUIList(bpy.types.UIList):
@@ -178,6 +297,7 @@ class LIST_OT_NewPogonaParticleAttr(bpy.types.Operator):
     def execute(self, context):
         vis_obj = context.object
         vis_obj.pogona_molecule_attributes.add()
+        molecules_visualization.update_missing_columns(vis_obj)
         return {'FINISHED'}
 
 class LIST_OT_DeletePogonaParticleAttr(bpy.types.Operator):
@@ -198,4 +318,5 @@ class LIST_OT_DeletePogonaParticleAttr(bpy.types.Operator):
             max(0, list_index - 1),
             len(ui_list) - 1
         )
+        molecules_visualization.update_missing_columns(context.object)
         return {'FINISHED'}
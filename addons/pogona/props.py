@@ -18,8 +18,10 @@
 # along with Pogona.  If not, see <https://www.gnu.org/licenses/>.import bpy
 
 import bpy
-import os
+from . import follow
+from . import molecules_visualization
 from . import util
+from .trajectory import steps
 
 
 _type_help = (
@@ -74,12 +76,23 @@ _attr_types_enum=(
     # ('STRING', "String", "String values"),
     # …except for this special case:
     ('STRING_HASH', "Hashed String",
-        "Integers from strings (tip: use modulo"),
+        "Integer codes of strings, stable across sessions. "
+        "The string of each code is listed in the object's "
+        "`pogona_string_labels` custom property"),
     ('FLOAT_VECTOR', "Vector",
         "Floating point vectors "
         "(attribute name will be extended with '_x', '_y', and '_z')"),
 )
 
+
+def _molecule_attribute_update_callback(self, context):
+    # The owning visualization object:
+    obj = self.id_data
+    obj['_pogona_molecule_position_force_update'] = True
+    molecules_visualization.update_missing_columns(obj)
+    context.scene.frame_current = context.scene.frame_current
+
+
 class PogonaVisAttributesProperty(bpy.types.PropertyGroup):
     """
     A property for defining which additional attributes to read from particle
@@ -89,15 +102,28 @@ class PogonaVisAttributesProperty(bpy.types.PropertyGroup):
     pogona_particle_attr: bpy.props.StringProperty(
         name="Particle Attribute",
         default="",
+        update=_molecule_attribute_update_callback,
     )
 
     pogona_particle_attr_type: bpy.props.EnumProperty(
         name="Attribute Type",
         items=_attr_types_enum,
         default='FLOAT',
+        update=_molecule_attribute_update_callback,
     )
 
 
+_step_lookup_items = (
+    (steps.LOOKUP_NEAREST, "Nearest",
+        "Show the nearest available time step"),
+    (steps.LOOKUP_PREVIOUS, "Previous",
+        "Show the last available time step up to the requested one"),
+    (steps.LOOKUP_NEXT, "Next",
+        "Show the first available time step from the requested one on"),
+    (steps.LOOKUP_EXACT, "Exact",
+        "Only show time steps that have a positions file"),
+)
+
 _shape_items_default = (
     ('NONE', "NONE", "Use this for any Pogona Object that has a (custom) "
         "mesh, i.e., no sensors or injectors"),
@@ -119,30 +145,16 @@ def _representation_update_scale_callback(self, context):
 def _molecule_positions_path_update_callback(self, context):
     # Adjust minimum and maximum step
     obj = context.active_object
-    path = bpy.path.abspath(obj.pogona_molecule_positions_path)
-    # bpy.path.abspath may still produce paths like
-    # `/home/user/path/to/blendfile/../../../selected-folder/`
-    # Can be resolved with os.path.abspath:
-    path = os.path.abspath(path)
-    steps = []
+    path = util.molecule_positions_directory(obj)
+    molecules_visualization.update_missing_columns(obj)
     try:
-        for filename in os.listdir(path):
-            m = util.MOLECULE_POSITIONS_CSV_PATTERN.match(filename)
-            if not m:
-                continue
-            steps.append(int(m.group('step')))
-        if '_RNA_UI' not in obj:
-            obj['_RNA_UI'] = dict()
-        if 'pogona_molecule_positions_step' not in obj['_RNA_UI']:
-            obj['_RNA_UI']['pogona_molecule_positions_step'] = dict()
-        min_steps = min(steps)
-        max_steps = max(steps)
-        obj['_RNA_UI']['pogona_molecule_positions_step'].update(dict(
-            min=min_steps,
-            max=max_steps,
-            soft_min=min_steps,
-            soft_max=max_steps,
-        ))
+        index = steps.step_index(path)
+        if len(index) == 0:
+            raise Warning("Could not find any molecule positions files for "
+                          f"object '{obj.name}'.")
+        min_steps = index.min
+        max_steps = index.max
+        util.set_step_range(obj, min_steps, max_steps)
         print(f"Set minimum step for object '{obj.name}' to "
               f"{min_steps} and the maximum to {max_steps}.")
     except FileNotFoundError as e:
@@ -155,11 +167,27 @@ def _molecule_positions_path_update_callback(self, context):
 
 
 def _molecule_positions_time_update_callback(self, context):
+    # Interpolation needs the `id` column:
+    molecules_visualization.update_missing_columns(self)
     # Trigger a frame change without changing the frame
     # to update the mesh:
     context.scene.frame_current = context.scene.frame_current
 
 
+def _molecule_follow_update_callback(self, context):
+    if self.pogona_molecule_follow:
+        follow.start(self)
+    else:
+        follow.stop(self.name)
+
+
+def _molecule_visualization_settings_update_callback(self, context):
+    # The time step did not change, update the mesh nevertheless:
+    self['_pogona_molecule_position_force_update'] = True
+    molecules_visualization.update_missing_columns(self)
+    context.scene.frame_current = context.scene.frame_current
+
+
 class PogonaRepresentationProperty(bpy.types.PropertyGroup):
     """
     What shape a component is supposed to take on in Blender.
@@ -237,7 +265,10 @@ def add_custom_properties_to_object_class():
         description="A folder with Pogona simulation results in the form of "
                     "CSV files named `positions.csv.<time step>`. "
                     "These files should have the following columns: "
-                    "(molecule) `id`, `x`, `y`, `z`, `cell_id`, `object_id`.",
+                    "(molecule) `id`, `x`, `y`, `z`, `cell_id`, `object_id`. "
+                    "If the folder contains a `positions.pogona-trajectory` "
+                    "file (see `python -m trajectory convert`), or if this "
+                    "is the path to such a file, it is read instead.",
         subtype='DIR_PATH',
         update=_molecule_positions_path_update_callback
     )
@@ -248,6 +279,181 @@ def add_custom_properties_to_object_class():
         options={'ANIMATABLE'},
         update=_molecule_positions_time_update_callback,
     )
+    bpy.types.Object.pogona_molecule_follow = bpy.props.BoolProperty(
+        name="Follow Simulation",
+        description="Watch the molecule positions path for new files while "
+                    "a simulation is running and advance to the latest "
+                    "time step once it is decoded. Has no effect while the "
+                    "time step is key-framed",
+        default=False,
+        update=_molecule_follow_update_callback,
+    )
+    bpy.types.Object.pogona_molecule_bake_path = bpy.props.StringProperty(
+        name="Baked Path",
+        description="Trajectory container with the time steps and columns "
+                    "this object uses, written by Bake Molecules "
+                    "(relative to the .blend file)",
+        subtype='FILE_PATH',
+        update=_molecule_visualization_settings_update_callback,
+    )
+    bpy.types.Object.pogona_molecule_use_bake = bpy.props.BoolProperty(
+        name="Use Bake",
+        description="Read the baked trajectory container instead of the "
+                    "molecule positions path, e.g., on render workers "
+                    "without access to the simulation results",
+        default=False,
+        update=_molecule_visualization_settings_update_callback,
+    )
+    bpy.types.Object.pogona_molecule_time_mapping = bpy.props.BoolProperty(
+        name="Map Frames to Time",
+        description="Compute the time step of each frame from the "
+                    "simulation time instead of the (key-framed) time step",
+        default=False,
+        update=_molecule_positions_time_update_callback,
+    )
+    bpy.types.Object.pogona_molecule_time_step = bpy.props.FloatProperty(
+        name="Simulation Time Step",
+        description="Simulated seconds between two time steps",
+        default=0.001,
+        min=1e-12,
+        precision=6,
+        update=_molecule_positions_time_update_callback,
+    )
+    bpy.types.Object.pogona_molecule_output_interval = bpy.props.IntProperty(
+        name="Output Interval",
+        description="Number of time steps between two positions files",
+        default=1,
+        min=1,
+        update=_molecule_positions_time_update_callback,
+    )
+    bpy.types.Object.pogona_molecule_time_offset = bpy.props.FloatProperty(
+        name="Start Time",
+        description="Simulation time in seconds shown at the first frame "
+                    "of the scene",
+        default=0.0,
+        precision=6,
+        update=_molecule_positions_time_update_callback,
+    )
+    bpy.types.Object.pogona_molecule_playback_speed = bpy.props.FloatProperty(
+        name="Playback Speed",
+        description="Simulated seconds per second of playback",
+        default=1.0,
+        min=0.0,
+        precision=6,
+        update=_molecule_positions_time_update_callback,
+    )
+    bpy.types.Object.pogona_molecule_step_lookup = bpy.props.EnumProperty(
+        name="Step Lookup",
+        description="Which time step to show if there is no positions file "
+                    "for the requested one, e.g., if the simulation only "
+                    "wrote every n-th time step",
+        items=_step_lookup_items,
+        default=steps.LOOKUP_NEAREST,
+        update=_molecule_positions_time_update_callback,
+    )
+    bpy.types.Object.pogona_molecule_interpolate = bpy.props.BoolProperty(
+        name="Interpolate",
+        description="Interpolate molecule positions and floating point "
+                    "attributes linearly between the available time steps "
+                    "before and after the (key-framed) time step. "
+                    "Molecules are matched by their `id` column",
+        default=False,
+        update=_molecule_positions_time_update_callback,
+    )
+    bpy.types.Object.pogona_molecule_reuse_mesh = bpy.props.BoolProperty(
+        name="Reuse Mesh",
+        description="Overwrite the vertices and attributes of the existing "
+                    "mesh on every time step instead of creating a new mesh. "
+                    "Disable this if other objects share this mesh.",
+        default=True,
+    )
+    bpy.types.Object.pogona_molecule_async_update = bpy.props.BoolProperty(
+        name="Asynchronous Updates",
+        description="Load molecule positions in the background and keep "
+                    "showing the previous time step until they are loaded, "
+                    "so that the user interface does not freeze. "
+                    "Renders always wait for the correct time step",
+        default=False,
+    )
+    bpy.types.Object.pogona_molecule_use_cache = bpy.props.BoolProperty(
+        name="Binary Cache",
+        description="Store decoded molecule positions files as binary "
+                    "arrays in a `.pogona_cache` folder next to them and "
+                    "load them from there until the CSV files change.",
+        default=True,
+    )
+    bpy.types.Object.pogona_molecule_viewport_fraction = (
+        bpy.props.FloatProperty(
+            name="Viewport Fraction",
+            description="Fraction of the molecules to show outside of "
+                        "renders. Which molecules are shown only depends on "
+                        "their `id` column, so it does not change between "
+                        "time steps",
+            default=1.0,
+            min=0.0,
+            max=1.0,
+            subtype='FACTOR',
+            update=_molecule_visualization_settings_update_callback,
+        )
+    )
+    bpy.types.Object.pogona_molecule_viewport_max_points = (
+        bpy.props.IntProperty(
+            name="Viewport Maximum",
+            description="Maximum number of molecules to show outside of "
+                        "renders (approximately). 0 for no limit",
+            default=0,
+            min=0,
+            update=_molecule_visualization_settings_update_callback,
+        )
+    )
+    bpy.types.Object.pogona_molecule_filter_region = bpy.props.EnumProperty(
+        name="Region",
+        description="Only show molecules in this region",
+        items=(
+            ('NONE', "Everywhere", "Show molecules everywhere"),
+            ('BOX', "Box", "Show molecules inside an axis-aligned box in "
+                           "this object's local coordinates"),
+            ('OBJECT', "Object Bounds",
+                "Show molecules inside the bounding box of another object"),
+        ),
+        default='NONE',
+        update=_molecule_visualization_settings_update_callback,
+    )
+    bpy.types.Object.pogona_molecule_filter_box_min = (
+        bpy.props.FloatVectorProperty(
+            name="Box Minimum",
+            subtype='XYZ_LENGTH',
+            size=3,
+            default=(-1.0, -1.0, -1.0),
+            update=_molecule_visualization_settings_update_callback,
+        )
+    )
+    bpy.types.Object.pogona_molecule_filter_box_max = (
+        bpy.props.FloatVectorProperty(
+            name="Box Maximum",
+            subtype='XYZ_LENGTH',
+            size=3,
+            default=(1.0, 1.0, 1.0),
+            update=_molecule_visualization_settings_update_callback,
+        )
+    )
+    bpy.types.Object.pogona_molecule_filter_object = bpy.props.PointerProperty(
+        type=bpy.types.Object,
+        name="Bounds Object",
+        description="Only show molecules inside the bounding box of this "
+                    "object",
+        update=_molecule_visualization_settings_update_callback,
+    )
+    bpy.types.Object.pogona_molecule_filter_object_ids = (
+        bpy.props.StringProperty(
+            name="Object IDs",
+            description="Only show molecules with these values in their "
+                        "`object_id` column, e.g., `1, 4-6`. "
+                        "Empty to show all",
+            default='',
+            update=_molecule_visualization_settings_update_callback,
+        )
+    )
     bpy.types.Object.pogona_molecule_attributes = bpy.props.CollectionProperty(
         type=PogonaVisAttributesProperty,
         name="Particle Attributes",
@@ -0,0 +1,200 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Render a frame range of a .blend file with several background Blender
+processes at once.
+
+The frame range is split into contiguous chunks, one per worker.
+Before rendering, every worker decodes the molecule positions its
+chunk needs into the binary cache.
+
+Usage (with any Python 3, Blender's bundled one included):
+
+    python addons/pogona/render_parallel.py scene.blend \\
+        --frames 1-250 --workers 8 --blender /path/to/blender
+
+Output paths and formats are taken from the .blend file.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+PROGRESS_PREFIX = 'POGONA_RENDERED_FRAME'
+
+
+def _chunks(frame_start, frame_end, workers):
+    """Split the inclusive frame range into up to `workers` chunks."""
+    frames = frame_end - frame_start + 1
+    workers = max(1, min(workers, frames))
+    size, remainder = divmod(frames, workers)
+    start = frame_start
+    for i in range(workers):
+        end = start + size - 1 + (1 if i < remainder else 0)
+        yield start, end
+        start = end + 1
+
+
+class _Worker:
+    def __init__(self, args, frame_start, frame_end, threads):
+        self.frame_start = frame_start
+        self.frame_end = frame_end
+        self.rendered = set()
+        self.log = []
+        command = [
+            args.blender, '--background', args.blend_file,
+            '--threads', str(threads),
+            '--python', os.path.abspath(__file__),
+            '--',
+            '--worker', f'{frame_start}-{frame_end}',
+        ]
+        self.process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+        )
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            if line.startswith(PROGRESS_PREFIX):
+                self.rendered.add(int(line.split()[1]))
+            else:
+                # Keep the end of the output for error reports:
+                self.log.append(line.rstrip())
+                del self.log[:-50]
+
+    def wait(self):
+        self.process.wait()
+        self._reader.join()
+
+    @property
+    def missing(self):
+        return sorted(
+            set(range(self.frame_start, self.frame_end + 1)) - self.rendered
+        )
+
+
+def _parse_range(text):
+    start, _, end = text.partition('-')
+    return int(start), int(end or start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n\n')[0],
+    )
+    parser.add_argument('blend_file')
+    parser.add_argument(
+        '--frames', required=True, type=_parse_range,
+        help="Inclusive frame range, e.g., 1-250",
+    )
+    parser.add_argument(
+        '--workers', type=int, default=os.cpu_count() or 1,
+        help="Number of Blender processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        '--threads', type=int, default=None,
+        help="Render threads per process "
+             "(default: number of CPUs divided by the number of workers)",
+    )
+    parser.add_argument(
+        '--blender', default='blender',
+        help="Blender executable (default: blender)",
+    )
+    args = parser.parse_args(argv)
+    frame_start, frame_end = args.frames
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+
+    start_time = time.perf_counter()
+    workers = [
+        _Worker(args, start, end, threads)
+        for start, end in _chunks(frame_start, frame_end, args.workers)
+    ]
+    total = frame_end - frame_start + 1
+    while any(worker.process.poll() is None for worker in workers):
+        done = sum(len(worker.rendered) for worker in workers)
+        print(f"\r{done}/{total} frames rendered", end='', flush=True)
+        time.sleep(1)
+    for worker in workers:
+        worker.wait()
+    print(
+        f"\r{sum(len(w.rendered) for w in workers)}/{total} frames rendered "
+        f"in {time.perf_counter() - start_time:.1f} s"
+    )
+
+    failed = [w for w in workers if w.process.returncode != 0 or w.missing]
+    for worker in failed:
+        print(
+            f"Worker for frames {worker.frame_start}-{worker.frame_end} "
+            f"exited with code {worker.process.returncode}; "
+            f"missing frames: {worker.missing}. Last output:",
+            file=sys.stderr,
+        )
+        print('\n'.join(worker.log), file=sys.stderr)
+    return 1 if failed else 0
+
+
+def worker_main(argv):
+    """Runs inside Blender: warm up the cache, then render our chunk."""
+    import bpy
+
+    # The add-on, if it is not enabled, is loaded from next to this
+    # script:
+    sys.path.insert(0, os.path.dirname(
+        os.path.dirname(os.path.abspath(__file__))))
+    from pogona import util
+    util.register_addon()
+    from pogona import molecules_visualization
+
+    frame_start, frame_end = _parse_range(argv[argv.index('--worker') + 1])
+    scene = bpy.context.scene
+    steps = molecules_visualization.warm_up(
+        scene, range(frame_start, frame_end + 1))
+    print(f"Decoded {steps} time steps for frames {frame_start}-{frame_end}.")
+
+    def report_frame(scene, *args):
+        print(f"{PROGRESS_PREFIX} {scene.frame_current}", flush=True)
+
+    bpy.app.handlers.render_write.append(report_frame)
+    scene.frame_start = frame_start
+    scene.frame_end = frame_end
+    bpy.ops.render.render(animation=True)
+    if molecules_visualization.render_errors:
+        print(
+            "Molecules of "
+            f"{', '.join(sorted(set(molecules_visualization.render_errors)))}"
+            " were not rendered correctly, see above.",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    if '--worker' in sys.argv:
+        worker_main(sys.argv[sys.argv.index('--') + 1:])
+    else:
+        sys.exit(main())
@@ -0,0 +1,231 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Parameter sweeps: write many variants of a Pogona scene YAML file.
+
+A sweep specification (YAML) lists parameters, each applied to a
+property of a named component. One variant is written for every
+combination of their values:
+
+    filename: "scene_{index:04d}.yaml"  # optional, this is the default
+    parameters:
+      - name: tube_length  # optional, for use in `filename`
+        component: Tube
+        property: scale  # translation, rotation, scale, or
+                         # visualization_scale
+        axis: 2          # optional, otherwise values are vectors
+        values: [0.01, 0.02, 0.04]
+      - component: Injector
+        property: translation
+        values: [[0, 0, 0], [0, 0, 0.005]]
+
+Variants are numbered in the order of `itertools.product` over the
+parameters and rendered deterministically, so the same specification
+and base scene always produce the same files.
+A manifest of content hashes in the output directory lets later runs
+skip variants whose file would not change.
+
+Does not depend on Blender; run with `addons/pogona/` on the Python
+path:
+
+    PYTHONPATH=addons/pogona python -m sweep spec.yaml \\
+        --base scene.yaml --output-dir sweep/
+"""
+
+import argparse
+import concurrent.futures
+import copy
+import hashlib
+import itertools
+import json
+import os
+import sys
+from typing import Dict, Iterator, Tuple
+
+import yaml
+
+from trajectory import atomic
+from trajectory import progress
+
+PROPERTIES = ('translation', 'rotation', 'scale', 'visualization_scale')
+MANIFEST_FILENAME = '.pogona-sweep.json'
+DEFAULT_FILENAME = 'scene_{index:04d}.yaml'
+
+_YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+_YamlDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+
+def load_yaml(path: str):
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=_YamlLoader)
+
+
+def variants(
+        components: Dict[str, Dict],
+        spec: Dict,
+) -> Iterator[Tuple[str, Dict[str, Dict]]]:
+    """
+    The file name and components of every variant of the scene with
+    `components` described by sweep specification `spec`.
+    `components` is not modified.
+    """
+    parameters = spec.get('parameters') or []
+    for i, parameter in enumerate(parameters):
+        if parameter.get('component') not in components:
+            raise ValueError(
+                f"Parameter {i}: no component '{parameter.get('component')}'"
+                " in the scene."
+            )
+        if parameter.get('property') not in PROPERTIES:
+            raise ValueError(
+                f"Parameter {i}: property must be one of "
+                f"{', '.join(PROPERTIES)}, not "
+                f"'{parameter.get('property')}'."
+            )
+        parameter.setdefault(
+            'name', f"{parameter['component']}_{parameter['property']}")
+    pattern = spec.get('filename', DEFAULT_FILENAME)
+
+    for index, values in enumerate(itertools.product(
+            *(parameter['values'] for parameter in parameters))):
+        variant = copy.deepcopy(components)
+        for parameter, value in zip(parameters, values):
+            component = variant[parameter['component']]
+            if 'axis' in parameter:
+                component[parameter['property']][parameter['axis']] = value
+            else:
+                component[parameter['property']] = list(value)
+        filename = pattern.format(index=index, **{
+            parameter['name']: value
+            for parameter, value in zip(parameters, values)
+        })
+        yield filename, variant
+
+
+def render(components: Dict[str, Dict]) -> bytes:
+    """The contents of a scene YAML file, independent of dict order."""
+    return yaml.dump(
+        dict(components=components),
+        Dumper=_YamlDumper,
+        default_flow_style=False,
+        sort_keys=True,
+    ).encode('utf-8')
+
+
+def write_variant(
+        path: str,
+        components: Dict[str, Dict],
+        known_digest: str = None,
+) -> Tuple[str, bool]:
+    """
+    Write a variant unless the file at `path` already has its contents
+    according to `known_digest`.
+
+    :return: The SHA-256 digest of the contents and whether the file
+        was written.
+    """
+    content = render(components)
+    digest = hashlib.sha256(content).hexdigest()
+    if (
+            digest == known_digest
+            and os.path.isfile(path)
+            and os.path.getsize(path) == len(content)
+    ):
+        return digest, False
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with atomic.write(path, 'wb') as f:
+        f.write(content)
+    return digest, True
+
+
+def _read_manifest(output_dir: str) -> Dict[str, str]:
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILENAME), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m sweep',
+        description=__doc__.strip().split('\n\n')[0],
+    )
+    parser.add_argument('spec', help="Sweep specification (YAML)")
+    parser.add_argument(
+        '--base', required=True,
+        help="Scene YAML (or JSON) file the variants are based on",
+    )
+    parser.add_argument('--output-dir', '-o', required=True)
+    parser.add_argument(
+        '--workers', type=int, default=None,
+        help="Number of processes (default: number of CPUs)",
+    )
+    args = parser.parse_args(argv)
+
+    spec = load_yaml(args.spec) or dict()
+    components = (load_yaml(args.base) or dict()).get('components') or dict()
+    output_dir = os.path.abspath(args.output_dir)
+    try:
+        all_variants = list(variants(components, spec))
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        print(f"Invalid sweep specification: {e}", file=sys.stderr)
+        return 1
+    filenames = [filename for filename, _ in all_variants]
+    if len(set(filenames)) != len(filenames):
+        print(
+            "The file name pattern gives the same name to several "
+            "variants; include {index}.",
+            file=sys.stderr,
+        )
+        return 1
+
+    manifest = _read_manifest(output_dir)
+    written = 0
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as pool:
+        futures = {
+            pool.submit(
+                write_variant,
+                os.path.join(output_dir, filename),
+                variant,
+                manifest.get(filename),
+            ): filename
+            for filename, variant in all_variants
+        }
+        for i, future in enumerate(
+                concurrent.futures.as_completed(futures), start=1):
+            digest, was_written = future.result()
+            manifest[futures[future]] = digest
+            written += was_written
+            progress.report(i, len(futures))
+
+    with open(os.path.join(output_dir, MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(
+        f"Wrote {written} of {len(all_variants)} variants to "
+        f"'{output_dir}' ({len(all_variants) - written} unchanged)."
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,29 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Reading and caching of Pogona molecule position outputs.
+
+Nothing in this package may import `bpy`, so that it can also be used
+from worker processes, benchmarks, and command-line tools that run with
+a plain Python interpreter (e.g., the one bundled with Blender).
+Outside of Blender, put `addons/pogona/` on the Python path and
+import this package as `trajectory`.
+"""
@@ -0,0 +1,227 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Command-line tools for Pogona molecule position outputs.
+
+Run with `addons/pogona/` on the Python path, e.g.:
+
+    PYTHONPATH=addons/pogona python -m trajectory build-cache <directory>
+    PYTHONPATH=addons/pogona python -m trajectory convert <directory>
+    PYTHONPATH=addons/pogona python -m trajectory statistics <directory>
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+
+from . import atomic
+from . import cache
+from . import container
+from . import positions
+from . import progress
+from . import statistics
+
+
+def _build_cache(args):
+    directory = os.path.abspath(args.directory)
+    columns = (
+        json.loads(args.columns) if args.columns
+        else positions.columns_for_attributes({})
+    )
+    filenames = [
+        positions.positions_filename(directory, step)
+        for step in sorted(positions.list_steps(directory))
+    ]
+    failed = 0
+    with concurrent.futures.ProcessPoolExecutor(args.workers) as pool:
+        futures = {
+            pool.submit(cache.build_cache, filename, columns): filename
+            for filename in filenames
+        }
+        for i, future in enumerate(
+                concurrent.futures.as_completed(futures), start=1):
+            try:
+                future.result()
+            except (OSError, ValueError) as e:
+                failed += 1
+                print(f"{futures[future]}: {e}", file=sys.stderr)
+            progress.report(i, len(filenames))
+    return 1 if failed else 0
+
+
+def _convert(args):
+    directory = os.path.abspath(args.directory)
+    output = args.output or os.path.join(
+        directory, container.CONTAINER_FILENAME)
+    steps = sorted(positions.list_steps(directory))
+    if not steps:
+        print(f"No positions.csv.<step> files in '{directory}'.",
+              file=sys.stderr)
+        return 1
+    if args.steps:
+        requested = {int(step) for step in args.steps.split(',')}
+        missing = requested.difference(steps)
+        if missing:
+            print(f"No positions files for time step(s) "
+                  f"{', '.join(map(str, sorted(missing)))}.",
+                  file=sys.stderr)
+            return 1
+        steps = sorted(requested)
+    filenames = [
+        positions.positions_filename(directory, step) for step in steps
+    ]
+    columns = (
+        json.loads(args.columns) if args.columns
+        # Guess from the largest file, which is the least likely to be
+        # missing rows:
+        else positions.infer_columns(max(filenames, key=os.path.getsize))
+    )
+
+    # Write to a temporary file so an aborted conversion never leaves an
+    # incomplete container behind:
+    workers = args.workers or os.cpu_count() or 1
+    with atomic.replacing(output) as tmp_output:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool, \
+                container.TrajectoryWriter(
+                    tmp_output, compression=args.compression) as writer:
+            # Bound the number of encoded steps waiting to be written:
+            window = 2 * workers
+            pending = []
+            for i, (step, filename) in enumerate(zip(steps, filenames)):
+                pending.append((step, pool.submit(
+                    container.encode_file,
+                    filename, columns, args.compression
+                )))
+                if len(pending) >= window or i == len(steps) - 1:
+                    for pending_step, future in pending:
+                        writer.add_encoded(pending_step, *future.result())
+                    progress.report(i + 1, len(steps))
+                    pending = []
+    print(f"Wrote {len(steps)} time steps to '{output}'.")
+    return 0
+
+
+def _statistics(args):
+    path = os.path.abspath(args.path)
+    columns = (
+        json.loads(args.columns) if args.columns
+        else positions.columns_for_attributes({})
+    )
+    try:
+        by_step = statistics.compute(
+            path, columns, args.workers, progress.report)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    for name, column in statistics.run_statistics(by_step).items():
+        print(f"{name}: {column['count']} values, min {column['min']}, "
+              f"max {column['max']}, mean {column['mean']}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m trajectory')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_cache = subparsers.add_parser(
+        'build-cache',
+        help="Decode every positions.csv.<step> file in a directory "
+             "into the binary cache.",
+    )
+    build_cache.add_argument('directory')
+    build_cache.add_argument(
+        '--columns',
+        help="JSON object of CSV column names mapped to their kind "
+             "('f', 'i', or 'U'). Defaults to the positions only.",
+    )
+    build_cache.add_argument(
+        '--workers', type=int, default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    build_cache.set_defaults(func=_build_cache)
+
+    convert = subparsers.add_parser(
+        'convert',
+        help="Convert a directory of positions.csv.<step> files into a "
+             "single trajectory container file.",
+    )
+    convert.add_argument('directory')
+    convert.add_argument(
+        '-o', '--output',
+        help="Output file "
+             f"(default: <directory>/{container.CONTAINER_FILENAME})",
+    )
+    convert.add_argument(
+        '--columns',
+        help="JSON object of CSV column names mapped to their kind "
+             "('f', 'i', or 'U'). "
+             "Defaults to all columns, with kinds guessed from the first "
+             "rows of the largest file.",
+    )
+    convert.add_argument(
+        '--steps',
+        help="Comma-separated time steps to convert (default: all)",
+    )
+    convert.add_argument(
+        '--compression',
+        choices=sorted(container.COMPRESSIONS),
+        default='none',
+        help="Per-column compression. Uncompressed containers are "
+             "memory-mapped when reading (default: none)",
+    )
+    convert.add_argument(
+        '--workers', type=int, default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    convert.set_defaults(func=_convert)
+
+    statistics_parser = subparsers.add_parser(
+        'statistics',
+        help="Compute count, minimum, maximum, mean, and a histogram of "
+             "columns in every time step and over all of them, and store "
+             f"them in {cache.CACHE_DIRNAME}/"
+             f"{statistics.STATISTICS_FILENAME}.",
+    )
+    statistics_parser.add_argument(
+        'path',
+        help="Directory of positions.csv.<step> files or trajectory "
+             "container",
+    )
+    statistics_parser.add_argument(
+        '--columns',
+        help="JSON object of CSV column names mapped to their kind "
+             "('f', 'i', or 'U'). String columns are skipped. "
+             "Defaults to the positions only.",
+    )
+    statistics_parser.add_argument(
+        '--workers', type=int, default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    statistics_parser.set_defaults(func=_statistics)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Atomically replace files, so that concurrent readers, e.g., other
+visualizations or render workers, never see partially written ones.
+"""
+
+import contextlib
+import os
+import tempfile
+from typing import IO, Iterator
+
+# Read once, since changing the umask to read it is not thread-safe:
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+@contextlib.contextmanager
+def replacing(path: str) -> Iterator[str]:
+    """
+    The path of a new temporary file next to `path` that replaces
+    `path` once the `with` block completes.
+    The temporary file is removed instead if the block raises.
+
+    Unlike files of `tempfile.mkstemp`, the file ends up with the
+    permissions of files created with `open`, so that other users can
+    read shared cache entries.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+@contextlib.contextmanager
+def write(path: str, mode: str = 'w') -> Iterator[IO]:
+    """
+    Like `open(path, mode)` for writing, but replace `path` only once
+    the `with` block completes (see `replacing`).
+    """
+    with replacing(path) as tmp_path:
+        with open(tmp_path, mode) as f:
+            yield f
@@ -0,0 +1,184 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Binary sidecar cache for decoded molecule positions files.
+
+The first time a `positions.csv.<step>` file is decoded, its columns are
+written as a structured `.npy` array into a `.pogona_cache` directory
+next to it. Later loads map this array into memory with `numpy.memmap`
+instead of parsing the CSV file again.
+The size and modification time of the CSV file are part of the cache
+file name, so any change to the CSV file invalidates its cache entry.
+A second, small `.bounds.npy` file holds the bounding boxes of blocks
+of molecules (see `filters.block_bounds`).
+"""
+
+import glob
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from . import atomic
+from . import filters
+from . import positions
+from . import subsample
+from . import timing
+
+CACHE_DIRNAME = '.pogona_cache'
+
+# Directories for which skipping subsampled frames was reported:
+_reported_uncached: Set[str] = set()
+
+
+def cache_filename(
+        filename: str,
+        stat: Optional[os.stat_result] = None,
+) -> str:
+    if stat is None:
+        stat = os.stat(filename)
+    directory, basename = os.path.split(filename)
+    return os.path.join(
+        directory,
+        CACHE_DIRNAME,
+        f'{basename}.{stat.st_size}.{stat.st_mtime_ns}.npy'
+    )
+
+
+def _bounds_filename(path: str) -> str:
+    return path[:-len('.npy')] + '.bounds.npy'
+
+
+def _frame_from_array(array: np.ndarray) -> positions.MoleculeFrame:
+    return positions.MoleculeFrame(
+        {name: array[name] for name in array.dtype.names},
+        count=len(array),
+    )
+
+
+def _save(path: str, array: np.ndarray):
+    with atomic.write(path, 'wb') as f:
+        np.save(f, array)
+
+
+def _write(path: str, frame: positions.MoleculeFrame):
+    array = np.empty(frame.count, dtype=[
+        (name, column.dtype) for name, column in frame.columns.items()
+    ])
+    for name, column in frame.columns.items():
+        array[name] = column
+    directory, basename = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+    bounds = filters.block_bounds(frame)
+    if bounds is not None:
+        # Before the cache entry, so it never lacks its bounds:
+        _save(_bounds_filename(path), bounds)
+    _save(path, array)
+    # Remove entries for previous versions of the CSV file:
+    csv_basename = basename.rsplit('.', 3)[0]
+    pattern = os.path.join(glob.escape(directory), f'{csv_basename}.*.npy')
+    for stale in glob.glob(pattern):
+        if stale not in (path, _bounds_filename(path)):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def _rows_in_box(path: str, count: int, box) -> Optional[np.ndarray]:
+    try:
+        bounds = np.load(_bounds_filename(path))
+    except (OSError, ValueError):
+        return None
+    return filters.intersecting_rows(bounds, box, count)
+
+
+def load_positions(
+        filename: str,
+        columns: Dict[str, str],
+        header: Optional[List[str]] = None,
+        box: Optional[Tuple[filters.Vector, filters.Vector]] = None,
+        max_molecules: int = 0,
+) -> positions.MoleculeFrame:
+    """
+    Like `positions.load_positions`, but read from and write to the
+    binary cache.
+    Columns that are not cached yet are added to the cache entry.
+    Failures to write the cache (e.g., for read-only result directories)
+    are ignored, as are subsampled frames.
+
+    :param box: If given, cached molecules in blocks that do not
+        intersect this box may be left out.
+    """
+    path = cache_filename(filename)
+    cached = None
+    try:
+        with timing.span('cache read', filename=path):
+            cached = np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        pass
+    if cached is not None:
+        cached_frame = _frame_from_array(cached)
+        if cached_frame.covers(columns):
+            rows = (
+                None if box is None
+                else _rows_in_box(path, len(cached), box)
+            )
+            if rows is not None:
+                # Only read the records of these blocks from the file:
+                cached_frame = _frame_from_array(cached[rows])
+            return subsample.subsample(
+                cached_frame, max_points=max_molecules)
+        # Keep previously cached columns in the cache entry:
+        columns = dict(columns)
+        for name, column in cached_frame.columns.items():
+            columns.setdefault(name, positions.column_kind(column.dtype))
+    if header is None:
+        header = positions.read_header(filename)
+    if subsample.ID_COLUMN in header:
+        # Always cache the ids, so subsampling cached frames keeps the
+        # same molecules as subsampling while parsing:
+        columns = dict(columns)
+        columns.setdefault(subsample.ID_COLUMN, positions.KIND_INT)
+    frame = positions.load_positions(
+        filename, columns, header=header, max_molecules=max_molecules)
+    if frame.subsampled:
+        directory = os.path.dirname(os.path.abspath(filename))
+        if directory not in _reported_uncached:
+            # Once per run, not for every frame during playback:
+            _reported_uncached.add(directory)
+            print(
+                f"Not caching positions files in '{directory}' with more "
+                f"than {max_molecules} molecules, e.g., '{filename}'."
+            )
+        return frame
+    try:
+        with timing.span('cache write', filename=path):
+            _write(path, frame)
+    except OSError as e:
+        print(f"Could not write molecule positions cache '{path}': {e}")
+    return frame
+
+
+def build_cache(filename: str, columns: Dict[str, str]) -> str:
+    """Make sure the cache entry for `filename` exists; return its path."""
+    load_positions(filename, columns)
+    return cache_filename(filename)
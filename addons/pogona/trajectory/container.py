@@ -0,0 +1,273 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Single-file container for all time steps of a molecule positions run.
+
+Layout:
+
+- 8 bytes magic number,
+- the column chunks of all time steps, each one a raw little-endian
+  array, optionally compressed with `zlib` or `lzma`,
+- a JSON index mapping every time step to its number of molecules,
+  the offset, size, and data type of each of its columns, and the
+  bounding boxes of its blocks of molecules
+  (see `filters.block_bounds`; optional),
+- a footer of the index offset and size (two unsigned 64-bit integers)
+  followed by the magic number again.
+
+Uncompressed columns are memory-mapped on reading, so loading a time
+step only touches the columns that are actually used.
+"""
+
+import json
+import lzma
+import os
+import struct
+import threading
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import filters
+from . import positions
+from . import timing
+
+CONTAINER_FILENAME = 'positions.pogona-trajectory'
+MAGIC = b'PGNTRJ\x00\x01'
+_FOOTER = struct.Struct('<QQ8s')
+VERSION = 1
+
+COMPRESSIONS = {
+    'none': (lambda data: data, lambda data: data),
+    'zlib': (zlib.compress, zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+
+def encode_file(
+        filename: str,
+        columns: Dict[str, str],
+        compression: str = 'none',
+) -> Tuple[int, Dict[str, Tuple[str, bytes]], Optional[list]]:
+    """Decode and encode a positions CSV file, e.g., in a worker process."""
+    return encode_frame(
+        positions.load_positions(filename, columns), compression)
+
+
+def find_container(path: str) -> Optional[str]:
+    """
+    If `path` is a container file or a directory with a container file
+    named `CONTAINER_FILENAME`, return the container's path.
+    """
+    if os.path.isfile(path):
+        return path
+    candidate = os.path.join(path, CONTAINER_FILENAME)
+    if os.path.isfile(candidate):
+        return candidate
+    return None
+
+
+def encode_frame(
+        frame: positions.MoleculeFrame,
+        compression: str = 'none',
+) -> Tuple[int, Dict[str, Tuple[str, bytes]], Optional[list]]:
+    """
+    :return: The number of molecules; for every column, its data
+        type and its (possibly compressed) bytes; and the block bounds
+        of the molecules, if `frame` has their positions.
+    """
+    compress, _ = COMPRESSIONS[compression]
+    chunks = dict()
+    for name, column in frame.columns.items():
+        column = np.ascontiguousarray(
+            column, dtype=column.dtype.newbyteorder('<'))
+        chunks[name] = (column.dtype.str, compress(column.tobytes()))
+    bounds = filters.block_bounds(frame)
+    return frame.count, chunks, None if bounds is None else bounds.tolist()
+
+
+class TrajectoryWriter:
+    """
+    Write time steps into a new container file.
+    Steps may be added in any order; use as a context manager or call
+    `close` to write the index.
+    """
+
+    def __init__(self, path: str, compression: str = 'none'):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}'.")
+        self.path = path
+        self.compression = compression
+        self._steps = dict()
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_frame(self, step: int, frame: positions.MoleculeFrame):
+        self.add_encoded(step, *encode_frame(frame, self.compression))
+
+    def add_encoded(
+            self,
+            step: int,
+            count: int,
+            chunks: Dict[str, Tuple[str, bytes]],
+            bounds: Optional[list] = None,
+    ):
+        """Add a time step as returned by `encode_frame`."""
+        if step in self._steps:
+            raise ValueError(f"Time step {step} was already added.")
+        columns = dict()
+        for name, (dtype, data) in chunks.items():
+            columns[name] = dict(
+                dtype=dtype,
+                offset=self._file.tell(),
+                size=len(data),
+            )
+            self._file.write(data)
+        self._steps[step] = dict(count=count, columns=columns)
+        if bounds is not None:
+            self._steps[step]['bounds'] = bounds
+
+    def close(self):
+        if self._file.closed:
+            return
+        index = json.dumps(dict(
+            version=VERSION,
+            compression=self.compression,
+            steps={
+                str(step): self._steps[step] for step in sorted(self._steps)
+            },
+        )).encode('utf-8')
+        offset = self._file.tell()
+        self._file.write(index)
+        self._file.write(_FOOTER.pack(offset, len(index), MAGIC))
+        self._file.close()
+
+
+class Trajectory:
+    """Random access by time step to a container file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"'{path}' is not a Pogona trajectory file.")
+            f.seek(-_FOOTER.size, os.SEEK_END)
+            offset, size, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+            if magic != MAGIC:
+                raise ValueError(
+                    f"'{path}' is incomplete; was its conversion aborted?")
+            f.seek(offset)
+            index = json.loads(f.read(size).decode('utf-8'))
+        if index['version'] != VERSION:
+            raise ValueError(
+                f"Unsupported trajectory file version {index['version']}.")
+        self.compression = index['compression']
+        self._steps = {
+            int(step): info for step, info in index['steps'].items()
+        }
+        self.steps: List[int] = sorted(self._steps)
+
+    def __contains__(self, step: int) -> bool:
+        return step in self._steps
+
+    def load(
+            self,
+            step: int,
+            columns: Dict[str, str],
+            box: Optional[Tuple[filters.Vector, filters.Vector]] = None,
+    ) -> positions.MoleculeFrame:
+        """
+        :param box: If given, molecules in blocks that do not intersect
+            this box may be left out.
+        """
+        try:
+            info = self._steps[step]
+        except KeyError:
+            raise FileNotFoundError(
+                f"Time step {step} is not in '{self.path}'.") from None
+        missing = [name for name in columns if name not in info['columns']]
+        if missing:
+            raise ValueError(
+                f"Time step {step} in '{self.path}' "
+                f"has no column(s) for {', '.join(missing)}."
+            )
+        rows = None
+        if box is not None and 'bounds' in info:
+            rows = filters.intersecting_rows(
+                np.array(info['bounds'], dtype=np.float64).reshape(-1, 6),
+                box, info['count'])
+        _, decompress = COMPRESSIONS[self.compression]
+        result = dict()
+        with open(self.path, 'rb') as f, timing.span(
+                'container read', filename=self.path, step=step):
+            for name in columns:
+                chunk = info['columns'][name]
+                dtype = np.dtype(chunk['dtype'])
+                if info['count'] == 0 or (rows is not None and not len(rows)):
+                    result[name] = np.empty(0, dtype=dtype)
+                elif self.compression == 'none':
+                    result[name] = np.memmap(
+                        f, dtype=dtype, mode='r',
+                        offset=chunk['offset'], shape=(info['count'],),
+                    )
+                else:
+                    f.seek(chunk['offset'])
+                    result[name] = np.frombuffer(
+                        decompress(f.read(chunk['size'])), dtype=dtype)
+                if rows is not None and len(rows):
+                    result[name] = result[name][rows]
+        return positions.MoleculeFrame(
+            result, count=info['count'] if rows is None else len(rows))
+
+
+_open_trajectories: Dict[str, Tuple[Tuple[int, int], Trajectory]] = dict()
+_open_trajectories_lock = threading.Lock()
+
+
+def open_trajectory(path: str) -> Trajectory:
+    """Like `Trajectory(path)`, but only read the index once per version."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    version = (stat.st_size, stat.st_mtime_ns)
+    with _open_trajectories_lock:
+        cached = _open_trajectories.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    trajectory = Trajectory(path)
+    with _open_trajectories_lock:
+        _open_trajectories[path] = (version, trajectory)
+    return trajectory
+
+
+def load_step(
+        path: str,
+        step: int,
+        columns: Dict[str, str],
+        box: Optional[Tuple[filters.Vector, filters.Vector]] = None,
+) -> positions.MoleculeFrame:
+    return open_trajectory(path).load(step, columns, box=box)
@@ -0,0 +1,85 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Dictionary encoding of string columns into integer codes.
+
+Unlike Python's `hash()`, which is salted per process, the codes only
+depend on the table of known labels, so they stay the same across
+Blender sessions and render workers that share the table.
+"""
+
+from typing import Iterable, List
+
+import numpy as np
+
+
+class UnknownStringsError(ValueError):
+    """Raised when encoding strings a frozen table does not have."""
+
+
+class StringDictionary:
+    """
+    Maps strings to the codes 0, 1, 2, … in the order they were added.
+    A frozen table does not accept new strings when encoding.
+    """
+
+    def __init__(self, labels: Iterable[str] = (), frozen: bool = False):
+        self.labels: List[str] = []
+        self.frozen = frozen
+        self._codes = dict()
+        self.add(labels)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def add(self, labels: Iterable[str]):
+        """Add unknown `labels` in the given order."""
+        for label in labels:
+            if label not in self._codes:
+                self._codes[label] = len(self.labels)
+                self.labels.append(label)
+
+    def encode(self, values: np.ndarray) -> np.ndarray:
+        """
+        The codes of all `values` as 32-bit integers for Blender.
+        Unknown values are added in sorted order, so encoding the same
+        column with the same table always gives the same codes.
+        Only looks up each distinct value once.
+
+        :raises UnknownStringsError: If the table is frozen and does not
+            have all `values`.
+        """
+        unique, inverse = np.unique(values, return_inverse=True)
+        unique = unique.tolist()
+        if self.frozen:
+            unknown = [label for label in unique if label not in self._codes]
+            if unknown:
+                raise UnknownStringsError(
+                    f"{len(unknown)} string(s) are not in the table, "
+                    f"e.g., {unknown[0]!r}."
+                )
+        self.add(unique)
+        codes = np.fromiter(
+            (self._codes[label] for label in unique),
+            dtype=np.int32,
+            count=len(unique),
+        )
+        return codes[inverse.ravel()]
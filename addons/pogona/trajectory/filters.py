@@ -0,0 +1,141 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Filter molecules by region of interest and by `object_id`.
+
+To skip reading molecules far from the region of interest, binary
+caches and containers store the bounding box of every block of
+`BLOCK_ROWS` consecutive molecules of a time step.
+"""
+
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from . import positions
+
+OBJECT_ID_COLUMN = 'object_id'
+BLOCK_ROWS = 65536
+
+Vector = Tuple[float, float, float]
+
+
+class MoleculeFilter(NamedTuple):
+    """
+    Which molecules to keep.
+    Coordinates are in the units of the positions files.
+    """
+    # Minimum and maximum corner of an axis-aligned box, or None:
+    box: Optional[Tuple[Vector, Vector]] = None
+    # Values of the `object_id` column to keep, or None for all:
+    object_ids: Optional[Tuple[int, ...]] = None
+
+    def columns(self) -> Dict[str, str]:
+        """The columns needed for evaluating this filter."""
+        columns = dict()
+        if self.box is not None:
+            for axis in positions.POSITION_COLUMNS:
+                columns[axis] = positions.KIND_FLOAT
+        if self.object_ids is not None:
+            columns[OBJECT_ID_COLUMN] = positions.KIND_INT
+        return columns
+
+    def mask(self, frame: positions.MoleculeFrame) -> np.ndarray:
+        keep = np.ones(frame.count, dtype=bool)
+        if self.box is not None:
+            lower, upper = self.box
+            for i, axis in enumerate(positions.POSITION_COLUMNS):
+                column = frame.columns[axis]
+                keep &= (column >= lower[i]) & (column <= upper[i])
+        if self.object_ids is not None:
+            keep &= np.isin(
+                frame.columns[OBJECT_ID_COLUMN], self.object_ids)
+        return keep
+
+
+def block_bounds(
+        frame: positions.MoleculeFrame,
+        block_rows: int = BLOCK_ROWS,
+) -> Optional[np.ndarray]:
+    """
+    The minimum and maximum x, y, and z (in this order) of every block
+    of `block_rows` molecules of `frame`, or None if `frame` does not
+    have the position columns.
+    """
+    if not all(axis in frame.columns for axis in positions.POSITION_COLUMNS):
+        return None
+    blocks = -(-frame.count // block_rows)
+    bounds = np.empty((blocks, 6))
+    for i, axis in enumerate(positions.POSITION_COLUMNS):
+        column = np.asarray(frame.columns[axis], dtype=np.float64)
+        starts = np.arange(0, frame.count, block_rows)
+        if blocks > 0:
+            bounds[:, i] = np.minimum.reduceat(column, starts)
+            bounds[:, i + 3] = np.maximum.reduceat(column, starts)
+    return bounds
+
+
+def intersecting_rows(
+        bounds: np.ndarray,
+        box: Tuple[Vector, Vector],
+        count: int,
+        block_rows: int = BLOCK_ROWS,
+) -> Optional[np.ndarray]:
+    """
+    Indices of the molecules in blocks with `bounds` intersecting `box`,
+    or None if all blocks intersect it.
+    """
+    lower, upper = np.asarray(box[0]), np.asarray(box[1])
+    hit = (
+        np.all(bounds[:, 3:] >= lower, axis=1)
+        & np.all(bounds[:, :3] <= upper, axis=1)
+    )
+    if hit.all():
+        return None
+    rows = (
+        np.flatnonzero(hit)[:, np.newaxis] * block_rows
+        + np.arange(block_rows)
+    ).ravel()
+    return rows[rows < count]
+
+
+def load_filtered(
+        load_frame: Callable[..., positions.MoleculeFrame],
+        molecule_filter: MoleculeFilter,
+        columns: Dict[str, str],
+        box_aware: bool = False,
+) -> positions.MoleculeFrame:
+    """
+    `load_frame(columns)` with only the molecules `molecule_filter`
+    keeps, but without the columns only needed for filtering.
+
+    :param box_aware: Whether `load_frame` accepts a `box` keyword
+        argument to skip blocks outside of it.
+    """
+    load_columns = dict(molecule_filter.columns(), **columns)
+    if box_aware and molecule_filter.box is not None:
+        frame = load_frame(load_columns, box=molecule_filter.box)
+    else:
+        frame = load_frame(load_columns)
+    frame = frame.take(np.flatnonzero(molecule_filter.mask(frame)))
+    for name in load_columns.keys() - columns.keys():
+        del frame.columns[name]
+    return frame
@@ -0,0 +1,75 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Linear interpolation of molecule positions between two time steps.
+"""
+
+import numpy as np
+
+from . import positions
+
+ID_COLUMN = 'id'
+
+
+def interpolate(
+        a: positions.MoleculeFrame,
+        b: positions.MoleculeFrame,
+        t: float,
+) -> positions.MoleculeFrame:
+    """
+    Blend frame `a` (at `t` = 0) into frame `b` (at `t` = 1).
+
+    Molecules are matched by their `id` column. For molecules present in
+    both frames, floating point columns are interpolated linearly,
+    all other columns are taken from the nearer frame.
+    Molecules that only exist in one of the frames (because they were
+    injected or left the simulation in between) are shown unchanged
+    while that frame is the nearer one.
+    Both frames need to have the same columns, including `id`.
+    """
+    ids_a = a.columns[ID_COLUMN]
+    ids_b = b.columns[ID_COLUMN]
+    _, common_a, common_b = np.intersect1d(
+        ids_a, ids_b, assume_unique=True, return_indices=True)
+    if t < .5:
+        only_nearer = np.setdiff1d(
+            np.arange(a.count), common_a, assume_unique=True)
+        nearer, common_nearer = a, common_a
+    else:
+        only_nearer = np.setdiff1d(
+            np.arange(b.count), common_b, assume_unique=True)
+        nearer, common_nearer = b, common_b
+
+    columns = dict()
+    for name, column_a in a.columns.items():
+        column_b = b.columns[name]
+        if column_a.dtype.kind == 'f':
+            common = (
+                column_a[common_a] * (1 - t) + column_b[common_b] * t
+            )
+        else:
+            common = nearer.columns[name][common_nearer]
+        columns[name] = np.concatenate((
+            common,
+            nearer.columns[name][only_nearer],
+        ))
+    return positions.MoleculeFrame(
+        columns, count=len(common_a) + len(only_nearer))
@@ -0,0 +1,113 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+In-memory least-recently-used cache of decoded molecule positions files.
+"""
+
+import collections
+import threading
+from typing import Callable, Dict, Hashable, Optional
+
+from . import positions
+
+
+class FrameCache:
+    """
+    Decoded frames limited to a total of `max_bytes` bytes of column data.
+    May be shared by any number of visualizations and threads.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._frames = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self):
+        return len(self._frames)
+
+    def get(self, key: Hashable) -> Optional[positions.MoleculeFrame]:
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+            return frame
+
+    def put(self, key: Hashable, frame: positions.MoleculeFrame):
+        with self._lock:
+            previous = self._frames.pop(key, None)
+            if previous is not None:
+                self.resident_bytes -= previous.nbytes
+            self._frames[key] = frame
+            self.resident_bytes += frame.nbytes
+            self._evict()
+
+    def resize(self, max_bytes: int):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self.resident_bytes = 0
+
+    def _evict(self):
+        # Always keep the most recent frame, even if it exceeds the budget:
+        while self.resident_bytes > self.max_bytes and len(self._frames) > 1:
+            _, frame = self._frames.popitem(last=False)
+            self.resident_bytes -= frame.nbytes
+            self.evictions += 1
+
+    def load(
+            self,
+            key: Hashable,
+            columns: Dict[str, str],
+            load_frame: Callable[[Dict[str, str]], positions.MoleculeFrame],
+    ) -> positions.MoleculeFrame:
+        """
+        Return the cached frame for `key` if it has all `columns`,
+        otherwise decode them with `load_frame` and cache the result.
+
+        :param key: Must change whenever the underlying file changes,
+            e.g., by including its size and modification time.
+        """
+        frame = self.get(key)
+        if frame is not None and frame.covers(columns):
+            self.hits += 1
+            return frame
+        self.misses += 1
+        if frame is not None:
+            # Keep the columns other visualizations asked for:
+            columns = dict(columns)
+            for name, column in frame.columns.items():
+                columns.setdefault(name, positions.column_kind(column.dtype))
+        frame = load_frame(columns)
+        self.put(key, frame)
+        return frame
@@ -0,0 +1,370 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Columnar loading of `positions.csv.<step>` files with NumPy.
+"""
+
+import csv
+import inspect
+import itertools
+import os
+import re
+import warnings
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from . import dictionary
+from . import schema
+from . import timing
+
+
+MOLECULE_POSITIONS_CSV_PATTERN = re.compile(r'positions\.csv\.(?P<step>\d+)')
+
+POSITION_COLUMNS = ('x', 'y', 'z')
+
+# Column kinds as stored in a MoleculeFrame:
+KIND_FLOAT = 'f'
+KIND_INT = 'i'
+KIND_STRING = 'U'
+_kind_dtypes = {
+    KIND_FLOAT: np.float64,
+    KIND_INT: np.int64,
+}
+
+# Rows parsed at once by `load_positions`:
+CHUNK_ROWS = 2 ** 16
+_COUNT_BLOCK_SIZE = 2 ** 24
+_LOADTXT_QUOTECHAR = 'quotechar' in inspect.signature(np.loadtxt).parameters
+
+
+def column_kind(dtype: np.dtype) -> str:
+    return KIND_STRING if dtype.kind == 'U' else dtype.kind
+
+
+def positions_filename(directory: str, step: int) -> str:
+    return os.path.join(directory, f'positions.csv.{step}')
+
+
+def list_steps(directory: str) -> List[int]:
+    """All time steps with a positions file in `directory`, unsorted."""
+    steps = []
+    for filename in os.listdir(directory):
+        m = MOLECULE_POSITIONS_CSV_PATTERN.fullmatch(filename)
+        if not m:
+            continue
+        steps.append(int(m.group('step')))
+    return steps
+
+
+def read_header(filename: str) -> List[str]:
+    """Return the column names of a molecule positions CSV file."""
+    return list(schema.file_schema(filename).columns)
+
+
+def infer_columns(filename: str, rows: int = 100) -> Dict[str, str]:
+    """
+    Guess the kinds of all columns of a positions file from its first
+    `rows` rows. Positions are always floating point.
+    """
+    header = read_header(filename)
+    kinds = {name: KIND_INT for name in header}
+    with open(filename, 'r') as csv_file:
+        csv_file.readline()
+        for _, row in zip(range(rows), csv.reader(csv_file)):
+            for name, value in zip(header, row):
+                if kinds[name] == KIND_INT:
+                    try:
+                        int(value)
+                        continue
+                    except ValueError:
+                        kinds[name] = KIND_FLOAT
+                if kinds[name] == KIND_FLOAT:
+                    try:
+                        float(value)
+                    except ValueError:
+                        kinds[name] = KIND_STRING
+    for name in POSITION_COLUMNS:
+        kinds[name] = KIND_FLOAT
+    return kinds
+
+
+def columns_for_attributes(
+        attr_type_by_name: Dict[str, str],
+) -> Dict[str, str]:
+    """
+    :param attr_type_by_name: Pogona particle attribute names mapped to
+        one of the types in `props._attr_types_enum`.
+    :return: The CSV columns (including the positions) needed for these
+        attributes, mapped to their column kind.
+    """
+    columns = {name: KIND_FLOAT for name in POSITION_COLUMNS}
+    for attr_name, attr_type in attr_type_by_name.items():
+        if attr_type == 'INT':
+            columns[attr_name] = KIND_INT
+        elif attr_type == 'FLOAT':
+            columns[attr_name] = KIND_FLOAT
+        elif attr_type in ('STRING', 'STRING_HASH'):
+            columns[attr_name] = KIND_STRING
+        elif attr_type == 'FLOAT_VECTOR':
+            for axis in POSITION_COLUMNS:
+                columns[f'{attr_name}_{axis}'] = KIND_FLOAT
+        else:
+            raise ValueError(f"Unknown particle attribute type {attr_type}.")
+    return columns
+
+
+class MoleculeFrame:
+    """
+    The decoded columns of a single molecule positions file.
+
+    Floating point columns are kept as float64 and integer columns as
+    int64 so that conversions to Blender's single precision buffers
+    match those of Python's `float()` and `int()`.
+    """
+
+    def __init__(
+            self,
+            columns: Dict[str, np.ndarray],
+            count: int,
+            subsampled: bool = False,
+    ):
+        self.columns = columns
+        self.count = count
+        # Whether molecules were left out to limit memory usage:
+        self.subsampled = subsampled
+
+    def covers(self, columns: Dict[str, str]) -> bool:
+        """Whether this frame has all `columns` with the right kinds."""
+        return all(
+            name in self.columns
+            and column_kind(self.columns[name].dtype) == kind
+            for name, kind in columns.items()
+        )
+
+    def take(self, rows: np.ndarray) -> 'MoleculeFrame':
+        """A new frame of only the molecules at indices `rows`."""
+        return MoleculeFrame(
+            {name: column[rows] for name, column in self.columns.items()},
+            count=len(rows),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+    def positions(self, scale: float = 1.0) -> np.ndarray:
+        """Flat float32 buffer for `mesh.vertices.foreach_set('co', …)`."""
+        co = np.empty((self.count, 3), dtype=np.float32)
+        for i, axis in enumerate(POSITION_COLUMNS):
+            co[:, i] = self.columns[axis] * scale
+        return co.ravel()
+
+    def attribute(
+            self,
+            attr_name: str,
+            attr_type: str,
+            strings: Optional[dictionary.StringDictionary] = None,
+    ) -> np.ndarray:
+        """
+        Flat buffer for `mesh.attributes[attr_name].data.foreach_set(…)`.
+
+        :param strings: The table to encode a `STRING_HASH` attribute
+            with. Unknown strings are added to it.
+        """
+        if attr_type == 'INT':
+            # Blender stores 32-bit integers:
+            return self.columns[attr_name].astype(np.int32)
+        if attr_type == 'FLOAT':
+            return self.columns[attr_name].astype(np.float32)
+        if attr_type == 'STRING_HASH':
+            if strings is None:
+                strings = dictionary.StringDictionary()
+            return strings.encode(self.columns[attr_name])
+        if attr_type == 'FLOAT_VECTOR':
+            vec = np.empty((self.count, 3), dtype=np.float32)
+            for i, axis in enumerate(POSITION_COLUMNS):
+                vec[:, i] = self.columns[f'{attr_name}_{axis}']
+            return vec.ravel()
+        raise ValueError(f"Unsupported particle attribute type {attr_type}.")
+
+
+def count_rows(filename: str) -> int:
+    """
+    The number of rows after the header of a CSV file,
+    counted in fixed-size blocks.
+    """
+    lines = 0
+    last = b'\n'
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(_COUNT_BLOCK_SIZE), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        # Unterminated last line:
+        lines += 1
+    return max(0, lines - 1)
+
+
+def _parse_chunk(
+        lines: List[str],
+        index: Dict[str, int],
+        numeric: List[str],
+        strings: List[str],
+        dtype: list,
+) -> Dict[str, np.ndarray]:
+    """
+    Parse the `numeric` and `strings` columns of some lines of a
+    positions file. Quoted fields may contain commas and (doubled)
+    quotes, and `#` is a valid character in string columns.
+    """
+    if _LOADTXT_QUOTECHAR or (
+            not strings and not any('"' in line for line in lines)):
+        options = dict(
+            delimiter=',',
+            ndmin=1,
+            comments=None,
+        )
+        if _LOADTXT_QUOTECHAR:
+            options['quotechar'] = '"'
+        chunk = dict()
+        if numeric:
+            data = np.loadtxt(
+                lines,
+                usecols=[index[name] for name in numeric],
+                dtype=dtype,
+                **options,
+            )
+            chunk = {name: data[name] for name in numeric}
+        for name in strings:
+            chunk[name] = np.loadtxt(
+                lines, usecols=[index[name]], dtype=str, **options)
+        return chunk
+    # NumPy before 1.23 cannot parse quoted fields:
+    rows = [row for row in csv.reader(lines) if row]
+    chunk = {
+        name: np.array([row[index[name]] for row in rows], dtype=str)
+        for name in numeric + strings
+    }
+    for name, numeric_dtype in dtype:
+        chunk[name] = chunk[name].astype(numeric_dtype)
+    return chunk
+
+
+def load_positions(
+        filename: str,
+        columns: Dict[str, str],
+        header: Optional[List[str]] = None,
+        max_molecules: int = 0,
+        chunk_rows: int = CHUNK_ROWS,
+        fraction: float = 1.0,
+) -> MoleculeFrame:
+    """
+    Parse only the requested columns of a molecule positions CSV file.
+
+    The file is parsed in chunks of `chunk_rows` rows straight into
+    arrays allocated from a count of its rows, so peak memory stays
+    close to the size of the result.
+
+    :param columns: Column names mapped to their kind,
+        see `columns_for_attributes`.
+    :param header: The file's column names, if already known.
+    :param max_molecules: If the file has more molecules than this,
+        keep about this many (see `subsample`) instead. 0 for no limit.
+    :param fraction: Keep only about this fraction of the molecules
+        (see `subsample`), and at most about `max_molecules`.
+    """
+    from . import subsample
+
+    if header is None:
+        with timing.span('open', filename=filename):
+            header = read_header(filename)
+    index = {name: i for i, name in enumerate(header)}
+    missing = [name for name in columns if name not in index]
+    if missing:
+        raise ValueError(
+            f"Particle positions file {filename} "
+            f"has no column(s) for {', '.join(missing)}."
+        )
+
+    with timing.span('count', filename=filename):
+        rows = count_rows(filename)
+    kinds = dict(columns)
+    if 0 < max_molecules < rows:
+        fraction = min(fraction, max_molecules / rows)
+    if fraction >= 1:
+        fraction = None
+    capacity = rows
+    if fraction is not None:
+        # The number of molecules kept varies a bit:
+        capacity = min(rows, int(rows * fraction * 1.05) + 1024)
+        if subsample.ID_COLUMN in index:
+            kinds.setdefault(subsample.ID_COLUMN, KIND_INT)
+    numeric = [name for name, kind in kinds.items() if kind != KIND_STRING]
+    strings = [name for name, kind in kinds.items() if kind == KIND_STRING]
+    dtype = [(name, _kind_dtypes[kinds[name]]) for name in numeric]
+    result: Dict[str, np.ndarray] = {
+        name: np.empty(capacity, dtype=_kind_dtypes[kinds[name]])
+        for name in numeric
+    }
+    count = 0
+    offset = 0
+    with open(filename, 'r') as csv_file, warnings.catch_warnings(), \
+            timing.span('parse', filename=filename):
+        # Files without any molecules only consist of a header:
+        warnings.filterwarnings('ignore', message='loadtxt: input contained')
+        csv_file.readline()
+        while True:
+            lines = list(itertools.islice(csv_file, chunk_rows))
+            if not lines:
+                break
+            chunk = _parse_chunk(lines, index, numeric, strings, dtype)
+            chunk_count = len(next(iter(chunk.values()))) if chunk else 0
+            if fraction is not None:
+                keep = subsample.selected(
+                    fraction, chunk_count,
+                    chunk.get(subsample.ID_COLUMN), offset)
+                chunk = {name: column[keep] for name, column in chunk.items()}
+                offset += chunk_count
+                chunk_count = len(keep)
+
+            if count + chunk_count > capacity:
+                # More rows than counted (cannot happen for well-formed
+                # files) or molecules kept than expected:
+                capacity = max(count + chunk_count, int(capacity * 1.5))
+                for name, column in result.items():
+                    result[name] = np.resize(column, capacity)
+            for name, column in chunk.items():
+                if name not in result:
+                    result[name] = np.empty(capacity, dtype=column.dtype)
+                elif column.dtype.itemsize > result[name].dtype.itemsize:
+                    # Longer strings than in previous chunks:
+                    result[name] = result[name].astype(column.dtype)
+                result[name][count:count + chunk_count] = column
+            count += chunk_count
+
+    for name in strings:
+        result.setdefault(name, np.empty(0, dtype=str))
+    result = {
+        name: column[:count] for name, column in result.items()
+        if name in columns
+    }
+    return MoleculeFrame(result, count=count, subsampled=fraction is not None)
@@ -0,0 +1,82 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Background read-ahead of molecule positions files.
+"""
+
+import collections
+import concurrent.futures
+import threading
+from typing import Callable, Hashable
+
+
+class Prefetcher:
+    """
+    Decode files on a thread pool before they are needed.
+
+    Results are identified by a hashable key. `get` returns the result
+    of a previous `prefetch` for the same key (waiting for it if it is
+    still being decoded) and otherwise loads synchronously.
+    Only the `capacity` most recently requested results are kept.
+    """
+
+    def __init__(self, workers: int, capacity: int):
+        self.workers = workers
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix='pogona-prefetch',
+        )
+        self._futures = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def prefetch(self, key: Hashable, load: Callable, *args):
+        with self._lock:
+            if key in self._futures:
+                self._futures.move_to_end(key)
+                return
+            self._futures[key] = self._pool.submit(load, *args)
+            while len(self._futures) > self.capacity:
+                _, future = self._futures.popitem(last=False)
+                future.cancel()
+
+    def get(self, key: Hashable, load: Callable, *args):
+        with self._lock:
+            future = self._futures.pop(key, None)
+        if future is None or future.cancelled():
+            self.misses += 1
+            return load(*args)
+        self.hits += 1
+        return future.result()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def shutdown(self):
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+            self._futures.clear()
+        self._pool.shutdown(wait=False)
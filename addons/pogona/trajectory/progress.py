@@ -0,0 +1,44 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Machine-readable progress of the command-line tools, which the Blender
+operators running them (see `ops.run_tool`) show in the status bar.
+"""
+
+from typing import Optional, Tuple
+
+PREFIX = 'progress'
+
+
+def report(done: int, total: int):
+    """Print that `done` of `total` work items are done."""
+    print(f"{PREFIX} {done} {total}", flush=True)
+
+
+def parse(line: str) -> Optional[Tuple[int, int]]:
+    """
+    `done` and `total` of a line printed by `report`,
+    or None for any other output.
+    """
+    fields = line.split()
+    if len(fields) == 3 and fields[0] == PREFIX:
+        return int(fields[1]), int(fields[2])
+    return None
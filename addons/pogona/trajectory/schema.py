@@ -0,0 +1,92 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Column layout of the positions files of a simulation run.
+
+The header of a run is parsed once and cached per directory.
+Every file whose header line has the same bytes reuses the cached
+column names; a different header line (e.g., because the simulator's
+output changed mid-run) replaces the cached layout.
+"""
+
+import os
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+
+class Schema(NamedTuple):
+    header_bytes: bytes
+    columns: Tuple[str, ...]
+
+    def missing(self, columns: Iterable[str]) -> List[str]:
+        """Those of `columns` the files do not have."""
+        available = set(self.columns)
+        return [name for name in columns if name not in available]
+
+
+_schemas: Dict[str, Schema] = dict()
+_schemas_lock = threading.Lock()
+
+
+def _parse(header_bytes: bytes) -> Schema:
+    return Schema(
+        header_bytes=header_bytes,
+        columns=tuple(
+            name.strip() for name in header_bytes.decode('utf-8').split(',')
+        ),
+    )
+
+
+def file_schema(filename: str) -> Schema:
+    """
+    The column layout of positions file `filename`.
+    Only reads its first line, which is only parsed if it differs from
+    the last header seen in the same directory.
+    """
+    with open(filename, 'rb') as f:
+        header_bytes = f.readline()
+    directory = os.path.dirname(os.path.abspath(filename))
+    with _schemas_lock:
+        cached = _schemas.get(directory)
+    if cached is not None and cached.header_bytes == header_bytes:
+        return cached
+    schema = _parse(header_bytes)
+    if cached is not None:
+        print(
+            f"Columns of molecule positions files in '{directory}' changed "
+            f"from {', '.join(cached.columns)} "
+            f"to {', '.join(schema.columns)} in '{filename}'."
+        )
+    with _schemas_lock:
+        _schemas[directory] = schema
+    return schema
+
+
+def directory_schema(directory: str, filename: str) -> Schema:
+    """
+    The column layout of the positions files in `directory`,
+    read from `filename` if it is not known yet.
+    """
+    with _schemas_lock:
+        cached = _schemas.get(os.path.abspath(directory))
+    if cached is not None:
+        return cached
+    return file_schema(filename)
@@ -0,0 +1,281 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Per-step and per-run statistics of molecule attributes, e.g., for
+colour ramps that must not change between time steps.
+
+Statistics are stored as `statistics.json` in the `.pogona_cache`
+directory of a run. The entry of each time step records the size and
+modification time of its positions file (or container), so only new
+and changed time steps are computed again.
+"""
+
+import concurrent.futures
+import json
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import atomic
+from . import cache
+from . import container
+from . import positions
+
+STATISTICS_FILENAME = 'statistics.json'
+HISTOGRAM_BINS = 64
+
+
+def column_statistics(values: np.ndarray, bins: int = HISTOGRAM_BINS):
+    """
+    Count, minimum, maximum, mean, and a histogram of `bins` equally
+    wide bins between minimum and maximum of `values`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return dict(
+            count=0, min=None, max=None, mean=None, histogram=[0] * bins)
+    low = float(values.min())
+    high = float(values.max())
+    if low == high:
+        histogram = np.zeros(bins, dtype=np.int64)
+        histogram[0] = len(values)
+    else:
+        histogram, _ = np.histogram(values, bins=bins, range=(low, high))
+    return dict(
+        count=len(values),
+        min=low,
+        max=high,
+        mean=float(values.mean()),
+        histogram=histogram.tolist(),
+    )
+
+
+def _rebin(histogram, low, high, edges) -> np.ndarray:
+    """
+    Distribute the counts of `histogram` (equally wide bins between
+    `low` and `high`) onto the bins between `edges`, assuming values
+    are spread uniformly within each bin.
+    """
+    counts = np.asarray(histogram, dtype=np.float64)
+    if low == high:
+        # All values are equal:
+        i = min(np.searchsorted(edges, low, side='right') - 1,
+                len(edges) - 2)
+        result = np.zeros(len(edges) - 1)
+        result[i] = counts.sum()
+        return result
+    source_edges = np.linspace(low, high, len(counts) + 1)
+    # Cumulative counts at the source edges, interpolated linearly
+    # within bins and evaluated at the target edges:
+    cumulative = np.concatenate(([0.0], np.cumsum(counts)))
+    return np.diff(np.interp(edges, source_edges, cumulative))
+
+
+def merge(statistics: List[dict], bins: int = HISTOGRAM_BINS) -> dict:
+    """
+    Combine the statistics of one column in several time steps.
+    The combined histogram is exact only if all time steps have the same
+    minimum and maximum, otherwise counts are split proportionally
+    between overlapping bins (hence they are not integers).
+    """
+    statistics = [s for s in statistics if s['count'] > 0]
+    if not statistics:
+        return column_statistics(np.empty(0), bins)
+    count = sum(s['count'] for s in statistics)
+    low = min(s['min'] for s in statistics)
+    high = max(s['max'] for s in statistics)
+    edges = np.linspace(low, high, bins + 1)
+    histogram = np.zeros(bins)
+    if low == high:
+        histogram[0] = count
+    else:
+        for s in statistics:
+            histogram += _rebin(s['histogram'], s['min'], s['max'], edges)
+    return dict(
+        count=count,
+        min=low,
+        max=high,
+        mean=sum(s['mean'] * s['count'] for s in statistics) / count,
+        histogram=histogram.tolist(),
+    )
+
+
+def statistics_filename(path: str) -> str:
+    """The statistics file of the run at `path` (directory or container)."""
+    directory = path if os.path.isdir(path) else os.path.dirname(path)
+    return os.path.join(directory, cache.CACHE_DIRNAME, STATISTICS_FILENAME)
+
+
+def _step_version(path: str, step: int) -> List[int]:
+    container_path = container.find_container(path)
+    filename = (
+        container_path if container_path is not None
+        else positions.positions_filename(path, step)
+    )
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _steps(path: str) -> List[int]:
+    container_path = container.find_container(path)
+    if container_path is not None:
+        return sorted(container.open_trajectory(container_path).steps)
+    return sorted(positions.list_steps(path))
+
+
+def step_statistics(path: str, step: int, columns: Dict[str, str]) -> dict:
+    """
+    Statistics of the numeric `columns` of time step `step` of the run
+    at `path`. Fills the binary cache as a side effect.
+    """
+    columns = {
+        name: kind for name, kind in columns.items()
+        if kind != positions.KIND_STRING
+    }
+    container_path = container.find_container(path)
+    if container_path is not None:
+        frame = container.load_step(container_path, step, columns)
+    else:
+        frame = cache.load_positions(
+            positions.positions_filename(path, step), columns)
+    return {
+        name: column_statistics(frame.columns[name]) for name in columns
+    }
+
+
+_stored: Dict[str, Tuple[int, dict]] = dict()
+_stored_lock = threading.Lock()
+
+
+def _load(path: str) -> dict:
+    filename = statistics_filename(path)
+    try:
+        mtime_ns = os.stat(filename).st_mtime_ns
+    except FileNotFoundError:
+        return dict()
+    with _stored_lock:
+        cached = _stored.get(filename)
+    if cached is None or cached[0] != mtime_ns:
+        try:
+            with open(filename, 'r') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return dict()
+        cached = (mtime_ns, stored.get('steps', {}))
+        with _stored_lock:
+            _stored[filename] = cached
+    return cached[1]
+
+
+def _is_current(path: str, step: str, entry: dict) -> bool:
+    try:
+        return entry['version'] == _step_version(path, int(step))
+    except OSError:
+        return False
+
+
+def read(path: str) -> dict:
+    """
+    The stored statistics of the run at `path`, by time step (as a
+    string) and column. Time steps whose positions file changed since
+    are left out.
+    """
+    return {
+        step: entry['columns'] for step, entry in _load(path).items()
+        if _is_current(path, step, entry)
+    }
+
+
+def lookup(path: str, step: int) -> Optional[dict]:
+    """The stored statistics of time step `step` by column, if current."""
+    entry = _load(path).get(str(step))
+    if entry is None or not _is_current(path, str(step), entry):
+        return None
+    return entry['columns']
+
+
+def _write(path: str, by_step: dict, versions: Dict[str, List[int]]):
+    filename = statistics_filename(path)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with atomic.write(filename) as f:
+        json.dump(dict(steps={
+            step: dict(version=versions[step], columns=columns)
+            for step, columns in by_step.items()
+        }), f)
+
+
+def compute(
+        path: str,
+        columns: Dict[str, str],
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+) -> dict:
+    """
+    Update the stored statistics of `columns` for all time steps of the
+    run at `path` in parallel, one process per time step, and return
+    them like `read`.
+
+    :param progress: Called with the number of finished and of all time
+        steps that need to be computed.
+    """
+    path = os.path.abspath(path)
+    columns = {
+        name: kind for name, kind in columns.items()
+        if kind != positions.KIND_STRING
+    }
+    by_step = read(path)
+    versions = dict()
+    todo = []
+    for step in _steps(path):
+        versions[str(step)] = _step_version(path, step)
+        stored = by_step.get(str(step), {})
+        if not all(name in stored for name in columns):
+            todo.append(step)
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        futures = {
+            pool.submit(step_statistics, path, step, columns): step
+            for step in todo
+        }
+        for i, future in enumerate(
+                concurrent.futures.as_completed(futures), start=1):
+            step = str(futures[future])
+            by_step.setdefault(step, dict()).update(future.result())
+            if progress is not None:
+                progress(i, len(todo))
+    # Drop time steps that no longer exist:
+    by_step = {
+        step: entry for step, entry in by_step.items() if step in versions
+    }
+    _write(path, by_step, versions)
+    return by_step
+
+
+def run_statistics(by_step: dict) -> Dict[str, dict]:
+    """The statistics of each column over all time steps of `by_step`."""
+    names = sorted({name for entry in by_step.values() for name in entry})
+    return {
+        name: merge([
+            entry[name] for entry in by_step.values() if name in entry
+        ])
+        for name in names
+    }
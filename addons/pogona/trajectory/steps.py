@@ -0,0 +1,234 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Sorted index of the time steps available in a simulation run.
+
+For directories of `positions.csv.<step>` files, the index is stored in
+the `.pogona_cache` directory and only rebuilt when the modification
+time of the directory changes, i.e., when files were added or removed.
+"""
+
+import bisect
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from . import atomic
+from . import cache
+from . import container
+from . import positions
+
+INDEX_FILENAME = 'steps.json'
+
+# How to resolve a time step that has no positions file:
+LOOKUP_EXACT = 'EXACT'
+LOOKUP_NEAREST = 'NEAREST'
+LOOKUP_PREVIOUS = 'PREVIOUS'
+LOOKUP_NEXT = 'NEXT'
+
+
+class StepIndex:
+    def __init__(self, steps: Iterable[int]):
+        self.steps: List[int] = sorted(set(steps))
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __contains__(self, step: int) -> bool:
+        i = bisect.bisect_left(self.steps, step)
+        return i < len(self.steps) and self.steps[i] == step
+
+    @property
+    def min(self) -> Optional[int]:
+        return self.steps[0] if self.steps else None
+
+    @property
+    def max(self) -> Optional[int]:
+        return self.steps[-1] if self.steps else None
+
+    def add(self, step: int):
+        if step not in self:
+            bisect.insort(self.steps, step)
+
+    def resolve(
+            self,
+            step: int,
+            lookup: str = LOOKUP_NEAREST,
+    ) -> Optional[int]:
+        """
+        Return `step` if it is available, otherwise the nearest,
+        previous, or next available step, depending on `lookup`.
+        Returns None if there is no such step.
+        Ties are resolved in favor of the previous step.
+        """
+        i = bisect.bisect_left(self.steps, step)
+        if i < len(self.steps) and self.steps[i] == step:
+            return step
+        previous_step = self.steps[i - 1] if i > 0 else None
+        next_step = self.steps[i] if i < len(self.steps) else None
+        if lookup == LOOKUP_EXACT:
+            return None
+        if lookup == LOOKUP_PREVIOUS:
+            return previous_step
+        if lookup == LOOKUP_NEXT:
+            return next_step
+        if previous_step is None:
+            return next_step
+        if next_step is None:
+            return previous_step
+        if step - previous_step <= next_step - step:
+            return previous_step
+        return next_step
+
+
+def _index_filename(directory: str) -> str:
+    return os.path.join(directory, cache.CACHE_DIRNAME, INDEX_FILENAME)
+
+
+def _read_index(directory: str, mtime_ns: int) -> Optional[StepIndex]:
+    try:
+        with open(_index_filename(directory), 'r') as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if stored.get('directory_mtime_ns') != mtime_ns:
+        return None
+    return StepIndex(stored['steps'])
+
+
+def _store_index(filename: str, mtime_ns: int, index: StepIndex):
+    with atomic.write(filename) as f:
+        json.dump(dict(
+            directory_mtime_ns=mtime_ns,
+            steps=index.steps,
+        ), f)
+
+
+def _write_index(directory: str, index: StepIndex) -> int:
+    """
+    Store `index`; return the directory's modification time it is valid
+    for.
+    """
+    filename = _index_filename(directory)
+    try:
+        # Creating the cache directory changes the modification time of
+        # `directory`, but not the steps in it:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        mtime_ns = os.stat(directory).st_mtime_ns
+        _store_index(filename, mtime_ns, index)
+        return mtime_ns
+    except OSError as e:
+        print(f"Could not write time step index '{filename}': {e}")
+        return os.stat(directory).st_mtime_ns
+
+
+_indices: Dict[str, Tuple[Tuple, StepIndex]] = dict()
+# Directories whose index changed since it was last written:
+_unsaved: Set[str] = set()
+_indices_lock = threading.Lock()
+
+
+def step_index(path: str) -> StepIndex:
+    """
+    The time steps available under `path`, which may be a directory of
+    positions CSV files or (a directory containing) a trajectory
+    container.
+    Costs a single `os.stat` if nothing changed since the last call.
+    """
+    path = os.path.abspath(path)
+    container_path = container.find_container(path)
+    if container_path is not None:
+        stat = os.stat(container_path)
+        version = ('container', stat.st_size, stat.st_mtime_ns)
+    else:
+        stat = os.stat(path)
+        version = ('directory', stat.st_mtime_ns)
+    with _indices_lock:
+        cached = _indices.get(path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    if container_path is not None:
+        index = StepIndex(container.open_trajectory(container_path).steps)
+    else:
+        index = _read_index(path, stat.st_mtime_ns)
+        if index is None:
+            index = StepIndex(positions.list_steps(path))
+            if len(index) > 0:
+                # Only directories with positions files get a cache
+                # directory, not, e.g., that of an unset (relative) path:
+                version = ('directory', _write_index(path, index))
+    with _indices_lock:
+        _indices[path] = (version, index)
+        _unsaved.discard(path)
+    return index
+
+
+def update_index(directory: str, available: Iterable[int], mtime_ns: int):
+    """
+    Update the time step index of `directory` to the steps `available`
+    at its modification time `mtime_ns`, e.g., as seen by a
+    `watch.DirectoryWatcher`, without listing the directory again.
+    Only new steps are inserted. The index file is written by
+    `save_index`.
+    """
+    directory = os.path.abspath(directory)
+    version = ('directory', mtime_ns)
+    available = set(available)
+    with _indices_lock:
+        cached = _indices.get(directory)
+        if cached is not None and cached[0] == version:
+            return
+        if cached is None or not available.issuperset(cached[1].steps):
+            # Files were removed:
+            index = StepIndex(available)
+        else:
+            index = cached[1]
+            for step in available.difference(index.steps):
+                index.add(step)
+        _indices[directory] = (version, index)
+        _unsaved.add(directory)
+
+
+def save_index(directory: str):
+    """
+    Write the index of `directory` if `update_index` changed it and the
+    directory did not change since.
+    """
+    directory = os.path.abspath(directory)
+    with _indices_lock:
+        if directory not in _unsaved:
+            return
+        _unsaved.discard(directory)
+        version, index = _indices[directory]
+    filename = _index_filename(directory)
+    try:
+        if (
+                len(index) == 0
+                or not os.path.isdir(os.path.dirname(filename))
+                or os.stat(directory).st_mtime_ns != version[1]
+        ):
+            # Will be listed again on the next call to `step_index`.
+            return
+        _store_index(filename, version[1], index)
+    except OSError as e:
+        print(f"Could not write time step index '{filename}': {e}")
@@ -0,0 +1,99 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Deterministic subsampling of molecules, e.g., to draw fewer of them in
+the viewport.
+
+Whether a molecule is kept only depends on a hash of its `id`, so the
+same molecules are kept in every time step and points don't flicker
+during playback. Subsets for smaller fractions are contained in those
+for larger fractions.
+"""
+
+import math
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from . import positions
+from .interpolate import ID_COLUMN
+
+
+def id_hash(ids: np.ndarray) -> np.ndarray:
+    """
+    Uniformly distributed 64-bit hashes of integer `ids`
+    (the finalizer of the SplitMix64 generator).
+    """
+    h = ids.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+def selected(
+        fraction: float,
+        count: int,
+        ids: Optional[np.ndarray] = None,
+        offset: int = 0,
+) -> np.ndarray:
+    """
+    Indices of the molecules to keep of `count` molecules.
+
+    :param ids: The molecules' ids. Without them, every n-th molecule
+        is kept instead, counting from molecule number `offset`.
+    """
+    if fraction >= 1:
+        return np.arange(count)
+    if fraction <= 0:
+        return np.arange(0)
+    if ids is None:
+        stride = math.ceil(1 / fraction)
+        return np.arange(-offset % stride, count, stride)
+    threshold = np.uint64(fraction * float(2 ** 64 - 1))
+    return np.flatnonzero(id_hash(ids) < threshold)
+
+
+def subsample(
+        frame: positions.MoleculeFrame,
+        fraction: float = 1.0,
+        max_points: int = 0,
+) -> positions.MoleculeFrame:
+    """
+    Keep about `fraction` of the molecules of `frame`, and at most about
+    `max_points` of them unless `max_points` is 0.
+    Without the `id` column, every n-th molecule is kept.
+    """
+    if max_points > 0 and frame.count > 0:
+        fraction = min(fraction, max_points / frame.count)
+    if fraction >= 1:
+        return frame
+    return frame.take(
+        selected(fraction, frame.count, frame.columns.get(ID_COLUMN)))
+
+
+def load_subsampled(
+        load_frame: Callable[[Dict[str, str]], positions.MoleculeFrame],
+        fraction: float,
+        max_points: int,
+        columns: Dict[str, str],
+) -> positions.MoleculeFrame:
+    """`subsample(load_frame(columns), fraction, max_points)`"""
+    return subsample(load_frame(columns), fraction, max_points)
@@ -0,0 +1,59 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Mapping of animation frames to simulation time steps.
+"""
+
+import math
+from typing import NamedTuple
+
+
+class TimeMapping(NamedTuple):
+    """
+    Shows simulation time `offset` at frame `frame_start` and advances
+    `speed` simulated seconds per second of playback at `fps`.
+    """
+    # Simulated seconds per time step:
+    time_step: float
+    # Number of time steps between two positions files:
+    output_interval: int = 1
+    # Simulation time in seconds at `frame_start`:
+    offset: float = 0.0
+    # Simulated seconds per second of playback:
+    speed: float = 1.0
+    fps: float = 24.0
+    frame_start: int = 1
+
+    def time_at(self, frame: float) -> float:
+        """The simulation time in seconds shown at `frame`."""
+        return self.offset + (frame - self.frame_start) / self.fps * self.speed
+
+    def fractional_step_at(self, frame: float) -> float:
+        """The (fractional) time step at `frame`, e.g., to interpolate."""
+        return self.time_at(frame) / self.time_step
+
+    def step_at(self, frame: float) -> int:
+        """
+        The time step at `frame`, rounded to the nearest multiple of the
+        output interval.
+        """
+        intervals = self.fractional_step_at(frame) / self.output_interval
+        return math.floor(intervals + .5) * self.output_interval
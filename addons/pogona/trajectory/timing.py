@@ -0,0 +1,104 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Lightweight timing instrumentation for loading and showing molecules.
+
+Code to be measured is wrapped in `span(name)`. While `recorder.enabled`
+is set, every span is recorded with its start time, duration, and
+thread, so that a session can be summarized or exported as a Chrome
+trace (see chrome://tracing or https://ui.perfetto.dev).
+"""
+
+import collections
+import contextlib
+import os
+import statistics
+import threading
+import time
+from typing import Dict, Tuple
+
+
+class Recorder:
+    def __init__(self, max_events: int = 100_000):
+        self.enabled = False
+        # (name, start in s, duration in s, thread id, args):
+        self.events = collections.deque(maxlen=max_events)
+        self._origin = time.perf_counter()
+
+    def clear(self):
+        self.events.clear()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.events.append((
+                name,
+                start,
+                time.perf_counter() - start,
+                threading.get_ident(),
+                args,
+            ))
+
+    def summary(
+            self,
+            last: int = 1000,
+    ) -> Dict[str, Tuple[int, float, float]]:
+        """
+        For each span name among the `last` recorded events,
+        the number of events and their mean and maximum duration in s.
+        """
+        durations = collections.defaultdict(list)
+        for name, _, duration, _, _ in list(self.events)[-last:]:
+            durations[name].append(duration)
+        return {
+            name: (len(values), statistics.mean(values), max(values))
+            for name, values in durations.items()
+        }
+
+    def chrome_trace(self) -> dict:
+        """All recorded events in the Chrome trace event format."""
+        pid = os.getpid()
+        return dict(
+            traceEvents=[
+                dict(
+                    name=name,
+                    cat='pogona',
+                    ph='X',  # complete event
+                    ts=(start - self._origin) * 1e6,
+                    dur=duration * 1e6,
+                    pid=pid,
+                    tid=tid,
+                    args=args,
+                )
+                for name, start, duration, tid, args in list(self.events)
+            ],
+            displayTimeUnit='ms',
+        )
+
+
+recorder = Recorder()
+span = recorder.span
@@ -0,0 +1,220 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Detection of new `positions.csv.<step>` files while a simulation is
+still writing them.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+from typing import Dict, List, Optional, Set
+
+from . import positions
+
+# From <sys/inotify.h>:
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_NONBLOCK = 0o4000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_libc():
+    name = ctypes.util.find_library('c')
+    if name is None:
+        return None
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+def _inotify_watch(directory: str) -> Optional[int]:
+    """
+    A non-blocking inotify file descriptor watching `directory` for
+    files that were created, completely written, or removed, or None if
+    inotify is not
+    available (e.g., not on Linux, or on some network file systems).
+    """
+    libc = _load_libc()
+    if libc is None:
+        return None
+    fd = libc.inotify_init1(_IN_NONBLOCK)
+    if fd < 0:
+        return None
+    wd = libc.inotify_add_watch(
+        fd,
+        os.fsencode(directory),
+        _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE
+        | _IN_DELETE,
+    )
+    if wd < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _is_complete(filename: str, size: int) -> bool:
+    """Whether a positions file of `size` bytes ends with a full line."""
+    if size == 0:
+        return False
+    try:
+        with open(filename, 'rb') as f:
+            f.seek(size - 1)
+            return f.read(1) == b'\n'
+    except OSError:
+        return False
+
+
+class DirectoryWatcher:
+    """
+    Report time steps whose positions file in `directory` is complete,
+    in the order they become complete.
+
+    Uses inotify where available, so that `poll` costs a single
+    non-blocking read. Otherwise, `poll` lists the directory if its
+    modification time changed.
+    A file counts as complete when it was closed after writing
+    (inotify), or when its size did not change since the previous call
+    to `poll` (polling, and for the files that existed before). In both
+    cases, it must end with a line break.
+    Files that exist when watching starts are complete, except for the
+    one of the latest time step, which may still be written.
+    """
+
+    def __init__(self, directory: str, use_inotify: bool = True):
+        self.directory = directory
+        self._fd = _inotify_watch(directory) if use_inotify else None
+        self._directory_mtime_ns = os.stat(directory).st_mtime_ns
+        self._known: Set[int] = set(positions.list_steps(directory))
+        # Size of incomplete files at the previous call to `poll`:
+        self._pending: Dict[int, int] = dict()
+        if self._known:
+            self._pending[max(self._known)] = -1
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._fd is not None
+
+    @property
+    def steps(self) -> Set[int]:
+        """
+        All time steps with a positions file, complete or not, as of the
+        last call to `poll`.
+        """
+        return set(self._known)
+
+    @property
+    def directory_mtime_ns(self) -> int:
+        """
+        A modification time of the directory at which it had at most the
+        files in `steps`, e.g., for `steps.update_index`.
+        """
+        return self._directory_mtime_ns
+
+    def _read_events(self) -> Set[int]:
+        """Time steps whose file was closed after writing."""
+        closed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return closed
+                raise
+            offset = 0
+            while offset < len(data):
+                _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                m = positions.MOLECULE_POSITIONS_CSV_PATTERN.fullmatch(
+                    os.fsdecode(name))
+                if m is None:
+                    continue
+                step = int(m.group('step'))
+                if mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    self._known.discard(step)
+                    self._pending.pop(step, None)
+                    closed.discard(step)
+                    continue
+                self._known.add(step)
+                if mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                    closed.add(step)
+
+    def _scan(self):
+        mtime_ns = os.stat(self.directory).st_mtime_ns
+        if mtime_ns == self._directory_mtime_ns:
+            return
+        self._directory_mtime_ns = mtime_ns
+        listed = set(positions.list_steps(self.directory))
+        for step in listed.difference(self._known):
+            self._pending[step] = -1
+        self._known = listed
+
+    def poll(self) -> List[int]:
+        """The time steps that became complete since the last call."""
+        complete = []
+        if self._fd is not None:
+            # Before reading the events, so that files created later
+            # change the modification time again:
+            self._directory_mtime_ns = os.stat(self.directory).st_mtime_ns
+            for step in self._read_events():
+                self._pending.pop(step, None)
+                filename = positions.positions_filename(self.directory, step)
+                try:
+                    size = os.stat(filename).st_size
+                except OSError:
+                    continue
+                if _is_complete(filename, size):
+                    complete.append(step)
+        else:
+            self._scan()
+        for step, previous_size in list(self._pending.items()):
+            filename = positions.positions_filename(self.directory, step)
+            try:
+                size = os.stat(filename).st_size
+            except OSError:
+                # Removed or renamed in the meantime:
+                del self._pending[step]
+                continue
+            if size == previous_size and _is_complete(filename, size):
+                del self._pending[step]
+                complete.append(step)
+            else:
+                self._pending[step] = size
+        return sorted(complete)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        self.close()
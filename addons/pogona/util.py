@@ -18,10 +18,22 @@
 # along with Pogona.  If not, see <https://www.gnu.org/licenses/>.import bpy
 
 import bpy
-import re
+import mathutils
+import os
+from typing import Dict, Optional, Tuple
+from .trajectory import dictionary
+from .trajectory import filters
+from .trajectory import timemap
 
 
-MOLECULE_POSITIONS_CSV_PATTERN = re.compile(r'positions.csv.(?P<step>\d+)')
+def register_addon():
+    """
+    Register this add-on unless it is enabled in this Blender
+    installation, for scripts run with `blender --python`.
+    """
+    if not hasattr(bpy.types.Object, 'pogona_molecule_positions_path'):
+        from . import register
+        register()
 
 
 def delete_mesh(mesh: bpy.types.Mesh, clear_users=True):
@@ -40,3 +52,184 @@ def delete_mesh(mesh: bpy.types.Mesh, clear_users=True):
         raise Warning(f"Mesh '{mesh.name}' not deleted because of this "
                       f"exception: {e}")
         return False
+
+
+def preference(context: bpy.types.Context, name: str, default):
+    """
+    Read an add-on preference.
+    Falls back to `default` if the add-on was registered without being
+    enabled in the preferences, e.g., by a script in background mode.
+    """
+    addon = context.preferences.addons.get(__package__)
+    if addon is None:
+        return default
+    return getattr(addon.preferences, name, default)
+
+
+def molecule_positions_directory(
+        obj: bpy.types.Object,
+        baked: bool = True,
+) -> str:
+    """
+    The positions path of `obj`, or the path of its baked trajectory
+    container if it uses one (unless `baked` is False).
+    """
+    if baked and obj.pogona_molecule_use_bake:
+        return os.path.abspath(
+            bpy.path.abspath(obj.pogona_molecule_bake_path))
+    path = bpy.path.abspath(obj.pogona_molecule_positions_path)
+    # bpy.path.abspath may still produce paths like
+    # `/home/user/path/to/blendfile/../../../selected-folder/`
+    # Can be resolved with os.path.abspath:
+    return os.path.abspath(path)
+
+
+def set_step_range(obj: bpy.types.Object, min_step: int, max_step: int):
+    """Limit the time step property of `obj` to the available steps."""
+    if '_RNA_UI' not in obj:
+        obj['_RNA_UI'] = dict()
+    if 'pogona_molecule_positions_step' not in obj['_RNA_UI']:
+        obj['_RNA_UI']['pogona_molecule_positions_step'] = dict()
+    obj['_RNA_UI']['pogona_molecule_positions_step'].update(dict(
+        min=min_step,
+        max=max_step,
+        soft_min=min_step,
+        soft_max=max_step,
+    ))
+
+
+def molecule_attribute_types(obj: bpy.types.Object) -> Dict[str, str]:
+    """Names of the configured particle attributes mapped to their types."""
+    return {
+        item.pogona_particle_attr: item.pogona_particle_attr_type
+        for item in obj.pogona_molecule_attributes
+    }
+
+
+def string_dictionaries(
+        obj: bpy.types.Object,
+        frozen: bool = False,
+) -> Dict[str, dictionary.StringDictionary]:
+    """
+    The string tables of the `STRING_HASH` attributes of `obj`.
+    They are stored in the custom property `pogona_string_labels`,
+    where the index of a label is its code.
+
+    :param frozen: Fail instead of adding unknown strings.
+    """
+    stored = obj.get('pogona_string_labels', {})
+    return {
+        attr_name: dictionary.StringDictionary(
+            stored.get(attr_name, ()), frozen=frozen)
+        for attr_name, attr_type in molecule_attribute_types(obj).items()
+        if attr_type == 'STRING_HASH'
+    }
+
+
+def store_string_dictionaries(
+        obj: bpy.types.Object,
+        strings: Dict[str, dictionary.StringDictionary],
+):
+    """Store string tables that grew in `obj`'s custom properties."""
+    if 'pogona_string_labels' not in obj:
+        obj['pogona_string_labels'] = dict()
+    stored = obj['pogona_string_labels']
+    for attr_name, table in strings.items():
+        if len(table) != len(stored.get(attr_name, ())):
+            stored[attr_name] = table.labels
+
+
+def parse_ids(text: str) -> Tuple[int, ...]:
+    """Parse a list like `'1, 4-6'` into `(1, 4, 5, 6)`."""
+    ids = set()
+    for part in text.replace(',', ' ').split():
+        start, _, end = part.partition('-')
+        ids.update(range(int(start), int(end or start) + 1))
+    return tuple(sorted(ids))
+
+
+def molecule_filter(
+        obj: bpy.types.Object,
+        scene: bpy.types.Scene,
+) -> Optional[filters.MoleculeFilter]:
+    """
+    The molecules filter configured for `obj`, in the units of the
+    positions files, or None if all molecules are shown.
+    """
+    box = None
+    region = obj.pogona_molecule_filter_region
+    if region == 'BOX':
+        corners = [
+            mathutils.Vector(obj.pogona_molecule_filter_box_min),
+            mathutils.Vector(obj.pogona_molecule_filter_box_max),
+        ]
+    elif region == 'OBJECT' and obj.pogona_molecule_filter_object is not None:
+        # Bounding box of the other object in obj's local coordinates:
+        other = obj.pogona_molecule_filter_object
+        matrix = obj.matrix_world.inverted() @ other.matrix_world
+        corners = [matrix @ mathutils.Vector(c) for c in other.bound_box]
+    else:
+        corners = None
+    if corners is not None:
+        # Molecules are shown at their positions divided by the
+        # unit scale:
+        scale = scene.unit_settings.scale_length
+        box = (
+            tuple(min(c[i] for c in corners) * scale for i in range(3)),
+            tuple(max(c[i] for c in corners) * scale for i in range(3)),
+        )
+
+    object_ids = None
+    if obj.pogona_molecule_filter_object_ids.strip():
+        try:
+            object_ids = parse_ids(obj.pogona_molecule_filter_object_ids)
+        except ValueError:
+            raise Warning(
+                f"Invalid object IDs for object '{obj.name}': "
+                f"'{obj.pogona_molecule_filter_object_ids}'"
+            )
+
+    if box is None and object_ids is None:
+        return None
+    return filters.MoleculeFilter(box=box, object_ids=object_ids)
+
+
+def store_attribute_statistics(
+        obj: bpy.types.Object,
+        by_column: Dict[str, dict],
+):
+    """
+    Store the run statistics of each column (see
+    `trajectory.statistics.run_statistics`) in the custom property
+    `pogona_attribute_statistics` of `obj`, e.g., for drivers.
+    """
+    obj['pogona_attribute_statistics'] = {
+        name: dict(
+            # As a float, since ID properties are 32-bit integers:
+            count=float(column['count']),
+            min=column['min'],
+            max=column['max'],
+            mean=column['mean'],
+            histogram=column['histogram'],
+        )
+        for name, column in by_column.items()
+        # ID properties cannot be None:
+        if column['count'] > 0
+    }
+
+
+def time_mapping(
+        obj: bpy.types.Object,
+        scene: bpy.types.Scene,
+) -> Optional[timemap.TimeMapping]:
+    """The frame to time step mapping of `obj`, if it uses one."""
+    if not obj.pogona_molecule_time_mapping:
+        return None
+    return timemap.TimeMapping(
+        time_step=obj.pogona_molecule_time_step,
+        output_interval=obj.pogona_molecule_output_interval,
+        offset=obj.pogona_molecule_time_offset,
+        speed=obj.pogona_molecule_playback_speed,
+        fps=scene.render.fps / scene.render.fps_base,
+        frame_start=scene.frame_start,
+    )
@@ -0,0 +1,106 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Compare per-step time and memory of replacing the visualization mesh
+on every time step against updating it in place.
+
+Run in background Blender:
+
+    blender --background --factory-startup \\
+        --python benchmarks/bench_mesh_update.py -- --steps 10000
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import bpy
+import numpy as np
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, os.pardir, 'addons'))
+sys.path.insert(0, BENCHMARKS_DIR)
+import pogona  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def resident_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # Peak instead of current resident memory (KiB on Linux):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def play(directory, steps, reuse_mesh, report_every):
+    context = bpy.context
+    scene = context.scene
+    bpy.ops.pogona.add_moleculesvis()
+    obj = context.active_object
+    obj.pogona_molecule_reuse_mesh = reuse_mesh
+    attr = obj.pogona_molecule_attributes.add()
+    attr.pogona_particle_attr = 'speed'
+    attr.pogona_particle_attr_type = 'FLOAT'
+    obj.pogona_molecule_positions_path = directory
+
+    times = []
+    for step in range(steps):
+        obj.pogona_molecule_positions_step = step
+        start = time.perf_counter()
+        scene.frame_set(scene.frame_current)
+        times.append(time.perf_counter() - start)
+        if report_every and (step + 1) % report_every == 0:
+            print(
+                f"  step {step + 1:6d}: "
+                f"{np.mean(times[-report_every:]) * 1e3:.2f} ms/step, "
+                f"{len(bpy.data.meshes)} meshes, "
+                f"{resident_bytes() / 2 ** 20:.1f} MiB resident"
+            )
+    bpy.data.objects.remove(obj)
+    return np.array(times)
+
+
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--steps', type=int, default=10_000)
+    parser.add_argument('--molecules', type=int, default=1_000)
+    parser.add_argument('--report-every', type=int, default=1_000)
+    args = parser.parse_args(argv)
+
+    pogona.register()
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic.generate(tmp, molecules=args.molecules, steps=args.steps)
+        for reuse_mesh in (False, True):
+            print(f"reuse mesh: {reuse_mesh}")
+            times = play(tmp, args.steps, reuse_mesh, args.report_every)
+            print(
+                f"  mean {times.mean() * 1e3:.2f} ms/step, "
+                f"median {np.median(times) * 1e3:.2f} ms/step"
+            )
+
+
+if __name__ == '__main__':
+    main()
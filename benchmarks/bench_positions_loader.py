@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Compare the NumPy positions loader against the previous `csv.DictReader`
+implementation, both in speed and in the resulting buffers.
+
+Runs with any Python that has NumPy, e.g., the one bundled with Blender:
+
+    python benchmarks/bench_positions_loader.py --molecules 1000000
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, os.pardir, 'addons', 'pogona'))
+sys.path.insert(0, BENCHMARKS_DIR)
+import synthetic  # noqa: E402
+from trajectory import positions  # noqa: E402
+
+
+def load_dictreader(filename, attr_type_by_name, scale):
+    """The loader used by the frame-change handler up to now."""
+    verts = []
+    attr_data = {name: [] for name in attr_type_by_name}
+    with open(filename, 'r') as csv_file:
+        for row in csv.DictReader(csv_file):
+            verts.append((
+                float(row['x']) * scale,
+                float(row['y']) * scale,
+                float(row['z']) * scale
+            ))
+            for attr_name, attr_type in attr_type_by_name.items():
+                if attr_type == 'INT':
+                    attr_data[attr_name].append(int(row[attr_name]))
+                elif attr_type == 'FLOAT':
+                    attr_data[attr_name].append(float(row[attr_name]))
+                elif attr_type == 'STRING_HASH':
+                    attr_data[attr_name].append(hash(row[attr_name]))
+                elif attr_type == 'FLOAT_VECTOR':
+                    attr_data[attr_name].append((
+                        float(row[attr_name + '_x']),
+                        float(row[attr_name + '_y']),
+                        float(row[attr_name + '_z']),
+                    ))
+    return verts, attr_data
+
+
+def load_numpy(filename, attr_type_by_name, scale):
+    frame = positions.load_positions(
+        filename, positions.columns_for_attributes(attr_type_by_name)
+    )
+    return frame.positions(scale), {
+        name: frame.attribute(name, attr_type)
+        for name, attr_type in attr_type_by_name.items()
+    }
+
+
+def check_equal(reference, result):
+    """Compare as Blender would store the values (float32/int32)."""
+    verts, attr_data = reference
+    co, attributes = result
+    assert np.array_equal(np.asarray(verts, dtype=np.float32).ravel(), co)
+    for name, attr_type in synthetic.ATTRIBUTES.items():
+        if attr_type == 'STRING_HASH':
+            # Strings are dictionary-encoded now, so only check that
+            # equal strings get equal codes and different strings
+            # different ones:
+            expected = np.asarray(attr_data[name], dtype=np.int64)
+            pairs = np.unique(np.column_stack((expected, attributes[name])),
+                              axis=0)
+            assert len(pairs) == len(np.unique(expected)), name
+            assert len(pairs) == len(np.unique(attributes[name])), name
+            continue
+        if attr_type == 'INT':
+            expected = np.asarray(attr_data[name], dtype=np.int64)
+            expected = expected.astype(np.int32)
+        else:
+            expected = np.asarray(attr_data[name], dtype=np.float32).ravel()
+        assert np.array_equal(expected, attributes[name]), name
+
+
+def best_of(repeat, func, *args):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--molecules', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scale', type=float, default=1000.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic.generate(tmp, molecules=args.molecules, steps=1)
+        filename = positions.positions_filename(tmp, 0)
+        t_old, reference = best_of(
+            args.repeat, load_dictreader, filename, synthetic.ATTRIBUTES,
+            args.scale)
+        t_new, result = best_of(
+            args.repeat, load_numpy, filename, synthetic.ATTRIBUTES,
+            args.scale)
+        check_equal(reference, result)
+
+    print(f"molecules:  {args.molecules}")
+    print(f"DictReader: {t_old:.3f} s")
+    print(f"NumPy:      {t_new:.3f} s ({t_old / t_new:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Time the molecules visualization and the scene export on synthetic
+simulation runs of increasing size and write the results as JSON,
+so they can be compared across commits.
+
+Run in background Blender:
+
+    blender --background --factory-startup \\
+        --python benchmarks/bench_suite.py -- \\
+        --sizes 1e3 1e4 1e5 1e6 1e7 --output results.json
+
+Benchmarks:
+
+- `update`: `_update_all_molecule_visualizations` for every time step
+  of a run with `size` molecules, first with empty caches (`cold`),
+  then again with the binary cache written by the first pass (`warm`).
+- `scan`: setting the positions path of a visualization, which scans
+  a directory of `size` time steps, without an index (`cold`), with
+  the index persisted next to the files (`persisted`), and with the
+  index already in memory (`cached`).
+- `export`: `PogonaExporter.execute` for a scene of `size` components.
+
+Generated runs are kept in `--data-dir` and reused by later
+invocations with the same parameters.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import bpy
+import numpy as np
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, os.pardir, 'addons'))
+sys.path.insert(0, BENCHMARKS_DIR)
+import pogona  # noqa: E402
+import synthetic  # noqa: E402
+from pogona import molecules_visualization  # noqa: E402
+from pogona.trajectory import cache  # noqa: E402
+from pogona.trajectory import steps  # noqa: E402
+
+
+def summarize(benchmark, variant, size, times):
+    times = np.array(times)
+    result = dict(
+        benchmark=benchmark,
+        variant=variant,
+        size=size,
+        repetitions=len(times),
+        mean_s=float(times.mean()),
+        median_s=float(np.median(times)),
+        min_s=float(times.min()),
+        max_s=float(times.max()),
+    )
+    print(
+        f"{benchmark:>7} {variant:>9} {size:>10d}: "
+        f"median {result['median_s'] * 1e3:10.3f} ms, "
+        f"min {result['min_s'] * 1e3:10.3f} ms"
+    )
+    return result
+
+
+def add_visualization(directory):
+    context = bpy.context
+    bpy.ops.pogona.add_moleculesvis()
+    obj = context.active_object
+    for name, attr_type in synthetic.ATTRIBUTES.items():
+        attr = obj.pogona_molecule_attributes.add()
+        attr.pogona_particle_attr = name
+        attr.pogona_particle_attr_type = attr_type
+    obj.pogona_molecule_positions_path = directory
+    return obj
+
+
+def clear_caches(directory):
+    if molecules_visualization._frame_cache is not None:
+        molecules_visualization._frame_cache.clear()
+    with steps._indices_lock:
+        steps._indices.clear()
+    shutil.rmtree(
+        os.path.join(directory, cache.CACHE_DIRNAME), ignore_errors=True)
+
+
+def bench_update(directory, size, step_count):
+    synthetic.generate(directory, molecules=size, steps=step_count)
+    clear_caches(directory)
+    context = bpy.context
+    scene = context.scene
+    obj = add_visualization(directory)
+
+    results = []
+    for variant in ('cold', 'warm'):
+        if molecules_visualization._frame_cache is not None:
+            molecules_visualization._frame_cache.clear()
+        times = []
+        for step in range(step_count):
+            obj.pogona_molecule_positions_step = step
+            depsgraph = context.evaluated_depsgraph_get()
+            start = time.perf_counter()
+            molecules_visualization._update_all_molecule_visualizations(
+                scene, depsgraph)
+            times.append(time.perf_counter() - start)
+        results.append(summarize('update', variant, size, times))
+    bpy.data.objects.remove(obj)
+    return results
+
+
+def bench_scan(directory, size, repetitions):
+    os.makedirs(directory, exist_ok=True)
+    for step in range(size):
+        filename = os.path.join(directory, f'positions.csv.{step}')
+        if not os.path.exists(filename):
+            open(filename, 'w').close()
+    obj = add_visualization(directory)
+
+    def set_path():
+        start = time.perf_counter()
+        obj.pogona_molecule_positions_path = directory
+        return time.perf_counter() - start
+
+    results = []
+    times = []
+    for _ in range(repetitions):
+        clear_caches(directory)
+        times.append(set_path())
+    results.append(summarize('scan', 'cold', size, times))
+    times = []
+    for _ in range(repetitions):
+        with steps._indices_lock:
+            steps._indices.clear()
+        times.append(set_path())
+    results.append(summarize('scan', 'persisted', size, times))
+    results.append(summarize(
+        'scan', 'cached', size, [set_path() for _ in range(repetitions)]))
+    bpy.data.objects.remove(obj)
+    return results
+
+
+def bench_export(filepath, size, repetitions):
+    collection = bpy.context.scene.collection
+    bpy.ops.pogona.add_cube()
+    template = bpy.context.active_object
+    template.pogona_type.pogona_type_enum = 'CUSTOM'
+    objects = [template]
+    for _ in range(size - 1):
+        obj = template.copy()
+        collection.objects.link(obj)
+        objects.append(obj)
+
+    times = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        bpy.ops.pogona.exporter(filepath=filepath)
+        times.append(time.perf_counter() - start)
+    for obj in objects:
+        bpy.data.objects.remove(obj)
+    return [summarize('export', 'default', size, times)]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=BENCHMARKS_DIR,
+            capture_output=True,
+            check=True,
+            universal_newlines=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--sizes', type=float, nargs='+',
+        default=[1e3, 1e4, 1e5, 1e6, 1e7],
+        help="Number of molecules per time step for the update benchmark",
+    )
+    parser.add_argument(
+        '--steps', type=int, default=10,
+        help="Number of time steps per run for the update benchmark",
+    )
+    parser.add_argument(
+        '--scan-sizes', type=float, nargs='+', default=[1e3, 1e4, 1e5],
+        help="Number of time steps for the scan benchmark",
+    )
+    parser.add_argument(
+        '--export-sizes', type=float, nargs='+', default=[1e1, 1e2, 1e3],
+        help="Number of components for the export benchmark",
+    )
+    parser.add_argument('--repetitions', type=int, default=5)
+    parser.add_argument(
+        '--data-dir',
+        default=os.path.join(tempfile.gettempdir(), 'pogona-benchmarks'),
+    )
+    parser.add_argument('--output', default='bench-results.json')
+    args = parser.parse_args(argv)
+
+    pogona.register()
+    results = []
+    for size in map(int, args.sizes):
+        results += bench_update(
+            os.path.join(args.data_dir, f'update-{size}-{args.steps}'),
+            size, args.steps)
+    for size in map(int, args.scan_sizes):
+        results += bench_scan(
+            os.path.join(args.data_dir, f'scan-{size}'),
+            size, args.repetitions)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in map(int, args.export_sizes):
+            results += bench_export(
+                os.path.join(tmp, 'scene.yaml'), size, args.repetitions)
+
+    with open(args.output, 'w') as f:
+        json.dump(dict(
+            commit=git_commit(),
+            blender=bpy.app.version_string,
+            python=platform.python_version(),
+            platform=platform.platform(),
+            cpus=os.cpu_count(),
+            results=results,
+        ), f, indent=2)
+    print(f"Wrote results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
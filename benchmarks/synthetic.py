@@ -0,0 +1,170 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Generate synthetic Pogona simulation runs, i.e., directories of
+`positions.csv.<step>` files, for benchmarks.
+
+Besides the mandatory `id,x,y,z` columns, every run has columns for
+the given attributes, by default one per attribute type the molecules
+visualization supports (see `ATTRIBUTES`).
+
+Can be run with any Python 3 that has NumPy installed:
+
+    python benchmarks/synthetic.py <directory> \\
+        --molecules 1000000 --steps 10 \\
+        --attributes species:STRING_HASH velocity:FLOAT_VECTOR
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+ATTRIBUTE_TYPES = ('INT', 'FLOAT', 'STRING_HASH', 'FLOAT_VECTOR')
+
+# Default attribute names and types (as in the add-on's
+# `_attr_types_enum`) of the extra columns:
+ATTRIBUTES = {
+    'species_index': 'INT',
+    'speed': 'FLOAT',
+    'species': 'STRING_HASH',
+    'velocity': 'FLOAT_VECTOR',
+}
+
+SPECIES = ('sodium', 'chloride', 'water', 'tracer')
+
+# Written into every generated directory,
+# so existing runs can be reused if the parameters match:
+PARAMETERS_FILENAME = 'synthetic.json'
+
+
+def _attribute_columns(rng, name, attr_type, count):
+    if attr_type == 'INT':
+        return [(name, '%d', rng.integers(0, 1000, size=count))]
+    if attr_type == 'FLOAT':
+        return [(name, '%.9g', rng.uniform(0, 1, size=count))]
+    if attr_type == 'STRING_HASH':
+        species = rng.integers(0, len(SPECIES), size=count)
+        return [(name, '%s', np.array(SPECIES)[species])]
+    if attr_type == 'FLOAT_VECTOR':
+        vector = rng.normal(0, 1e-3, size=(count, 3))
+        return [
+            (f'{name}_{axis}', '%.9g', vector[:, i])
+            for i, axis in enumerate('xyz')
+        ]
+    raise ValueError(f"Unsupported attribute type {attr_type}.")
+
+
+def _columns(rng, molecules, attributes):
+    """Column name, format, and values of one time step."""
+    count = molecules - int(rng.integers(0, max(1, molecules // 10)))
+    columns = [
+        ('id', '%d', np.arange(count)),
+        ('x', '%.9g', rng.uniform(-0.01, 0.01, size=count)),
+        ('y', '%.9g', rng.uniform(-0.01, 0.01, size=count)),
+        ('z', '%.9g', rng.uniform(-0.01, 0.01, size=count)),
+    ]
+    for name, attr_type in attributes.items():
+        columns += _attribute_columns(rng, name, attr_type, count)
+    return columns
+
+
+def write_step(filename, rng, molecules, attributes=None):
+    columns = _columns(
+        rng, molecules, ATTRIBUTES if attributes is None else attributes)
+    data = np.empty((len(columns[0][2]), len(columns)), dtype=object)
+    for i, (_, _, values) in enumerate(columns):
+        data[:, i] = values
+    np.savetxt(
+        filename,
+        data,
+        delimiter=',',
+        header=','.join(name for name, _, _ in columns),
+        comments='',
+        fmt=[fmt for _, fmt, _ in columns],
+    )
+
+
+def generate(
+        directory, molecules, steps, seed=0, attributes=None) -> bool:
+    """
+    Write a run with `steps` time steps of about `molecules` molecules
+    each to `directory`, unless it already holds the same run.
+    The number of molecules varies a bit between steps.
+
+    :param attributes: Attribute names mapped to their types (see
+        `ATTRIBUTE_TYPES`), `ATTRIBUTES` if not given.
+    :return: Whether any files were written.
+    """
+    if attributes is None:
+        attributes = ATTRIBUTES
+    parameters = dict(
+        molecules=molecules, steps=steps, seed=seed,
+        attributes=attributes)
+    parameters_filename = os.path.join(directory, PARAMETERS_FILENAME)
+    try:
+        with open(parameters_filename) as f:
+            if json.load(f) == parameters:
+                return False
+    except (OSError, ValueError):
+        pass
+
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    for step in range(steps):
+        write_step(
+            os.path.join(directory, f'positions.csv.{step}'), rng, molecules,
+            attributes)
+    with open(parameters_filename, 'w') as f:
+        json.dump(parameters, f)
+    return True
+
+
+def _attribute(value):
+    """Parse a `name:TYPE` command-line argument."""
+    name, _, attr_type = value.rpartition(':')
+    if not name or attr_type not in ATTRIBUTE_TYPES:
+        raise argparse.ArgumentTypeError(
+            f"Expected NAME:TYPE with TYPE one of "
+            f"{', '.join(ATTRIBUTE_TYPES)}, got '{value}'.")
+    return name, attr_type
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('directory')
+    parser.add_argument('--molecules', type=int, default=1_000)
+    parser.add_argument('--steps', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--attributes', type=_attribute, nargs='*',
+        help="Extra columns as NAME:TYPE, "
+             f"by default {' '.join(map(':'.join, ATTRIBUTES.items()))}",
+    )
+    args = parser.parse_args()
+    generate(
+        args.directory, args.molecules, args.steps, args.seed,
+        None if args.attributes is None else dict(args.attributes))
+
+
+if __name__ == '__main__':
+    main()
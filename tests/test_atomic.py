@@ -0,0 +1,57 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Tests for atomically replacing files with `trajectory.atomic`.
+
+Run with `python -m pytest tests` from the repository root.
+"""
+
+import os
+import stat
+import sys
+
+import pytest
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), '..', 'addons', 'pogona'))
+
+from trajectory import atomic  # noqa: E402
+
+
+def test_replaces_with_umask_permissions(tmp_path):
+    path = tmp_path / 'entry.json'
+    path.write_text('old')
+    with atomic.write(str(path)) as f:
+        f.write('new')
+    assert path.read_text() == 'new'
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~atomic._UMASK
+    assert os.listdir(tmp_path) == ['entry.json']
+
+
+def test_keeps_file_and_removes_temporary_file_on_error(tmp_path):
+    path = tmp_path / 'entry.json'
+    path.write_text('old')
+    with pytest.raises(RuntimeError):
+        with atomic.write(str(path)) as f:
+            f.write('partial')
+            raise RuntimeError
+    assert path.read_text() == 'old'
+    assert os.listdir(tmp_path) == ['entry.json']
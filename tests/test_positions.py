@@ -0,0 +1,136 @@
+# Pogona Blender add-on
+# Copyright (C) 2020 Data Communications and Networking (TKN), TU Berlin
+#
+# This file is part of Pogona, a simulator for macroscopic molecular
+# communication.
+#
+# Pogona is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Pogona is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Pogona.  If not, see <https://www.gnu.org/licenses/>.
+
+
+"""
+Tests for parsing molecule positions files with `trajectory.positions`.
+
+Run with `python -m pytest tests` from the repository root.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), '..', 'addons', 'pogona'))
+
+from trajectory import positions  # noqa: E402
+from trajectory import subsample  # noqa: E402
+
+HEADER = 'id,x,y,z,label,speed\n'
+ROWS = [
+    '1,0.5,1.5,2.5,"a,b",1.0\n',
+    '2,1.0,2.0,3.0,"ab",2.0\n',
+    '3,1.5,2.5,3.5,tube#1,3.0\n',
+    '4,2.0,3.0,4.0,tube#2,4.0\n',
+    '5,2.5,3.5,4.5,"say ""hi""",5.0\n',
+    '6,3.0,4.0,5.0,plain,6.0\n',
+]
+LABELS = ['a,b', 'ab', 'tube#1', 'tube#2', 'say "hi"', 'plain']
+
+COLUMNS = dict(
+    positions.columns_for_attributes({'speed': 'FLOAT'}),
+    id=positions.KIND_INT,
+    label=positions.KIND_STRING,
+)
+
+
+@pytest.fixture(params=[True, False], ids=['quotechar', 'csv'])
+def loadtxt_quotechar(request, monkeypatch):
+    """Test with and without NumPy's support for quoted fields."""
+    if request.param and not positions._LOADTXT_QUOTECHAR:
+        pytest.skip("NumPy's loadtxt has no quotechar")
+    monkeypatch.setattr(positions, '_LOADTXT_QUOTECHAR', request.param)
+
+
+@pytest.fixture
+def positions_file(tmp_path, loadtxt_quotechar):
+    filename = tmp_path / 'positions.csv.0'
+    filename.write_text(HEADER + ''.join(ROWS))
+    return str(filename)
+
+
+@pytest.mark.parametrize('chunk_rows', [positions.CHUNK_ROWS, 2, 1])
+def test_quoted_and_hash_labels(positions_file, chunk_rows):
+    frame = positions.load_positions(
+        positions_file, COLUMNS, chunk_rows=chunk_rows)
+    assert frame.count == len(ROWS)
+    assert frame.columns['label'].tolist() == LABELS
+    # Columns after a quoted comma are not shifted:
+    np.testing.assert_array_equal(
+        frame.columns['speed'], [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    np.testing.assert_array_equal(frame.columns['id'], np.arange(1, 7))
+    np.testing.assert_array_equal(
+        frame.columns['x'], [0.5, 1.0, 1.5, 2.0, 2.5, 3.0])
+
+
+def test_numeric_columns_only(positions_file):
+    frame = positions.load_positions(
+        positions_file, positions.columns_for_attributes({'speed': 'FLOAT'}))
+    assert 'label' not in frame.columns
+    np.testing.assert_array_equal(
+        frame.columns['speed'], [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+
+def test_hash_labels_without_quotes(tmp_path, loadtxt_quotechar):
+    # No quotes anywhere, so only `comments` could cut these lines:
+    filename = tmp_path / 'positions.csv.0'
+    filename.write_text(HEADER + ''.join(ROWS[2:4]))
+    frame = positions.load_positions(str(filename), COLUMNS)
+    assert frame.columns['label'].tolist() == ['tube#1', 'tube#2']
+    np.testing.assert_array_equal(frame.columns['speed'], [3.0, 4.0])
+
+
+def test_distinct_labels_get_distinct_codes(positions_file):
+    frame = positions.load_positions(positions_file, COLUMNS)
+    codes = frame.attribute('label', 'STRING_HASH')
+    assert len(set(codes.tolist())) == len(LABELS)
+
+
+def test_infer_columns(positions_file):
+    kinds = positions.infer_columns(positions_file)
+    assert kinds['id'] == positions.KIND_INT
+    assert kinds['speed'] == positions.KIND_FLOAT
+    assert kinds['label'] == positions.KIND_STRING
+
+
+def test_fraction_keeps_the_molecules_subsample_keeps(tmp_path):
+    filename = tmp_path / 'positions.csv.0'
+    filename.write_text('id,x,y,z\n' + ''.join(
+        f'{i},{i},0,0\n' for i in range(1000)))
+    columns = positions.columns_for_attributes({})
+    columns['id'] = positions.KIND_INT
+    frame = positions.load_positions(
+        str(filename), columns, fraction=0.25, chunk_rows=64)
+    assert frame.subsampled
+    expected = subsample.subsample(
+        positions.load_positions(str(filename), columns), 0.25)
+    np.testing.assert_array_equal(
+        frame.columns['id'], expected.columns['id'])
+
+
+def test_list_steps_only_lists_positions_files(tmp_path):
+    for name in (
+            'positions.csv.3', 'positions.csv.12', 'positions.csv.12.bak',
+            'positions_csv_5', 'positions.csv.', 'steps.json'):
+        (tmp_path / name).touch()
+    assert sorted(positions.list_steps(str(tmp_path))) == [3, 12]